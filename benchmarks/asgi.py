@@ -0,0 +1,246 @@
+"""Throughput of the read pages under WSGI and under ASGI with async views.
+
+Each path runs in its own process on the same generated data (see
+``benchmarks/views.py``). A load generator inside the process keeps
+``--connections`` clients busy, each sending its next request as soon
+as the previous one is answered, for ``--seconds``:
+
+* WSGI: the requests go to ``yatube.wsgi.application`` through a pool
+  of ``--threads`` worker threads, the way a threaded server runs it;
+* ASGI: every client is a task on one event loop calling
+  ``yatube.asgi.application``, which routes to ``posts.async_views``.
+
+The requests are the index, group, profile, post and follow pages with
+the skew of ``views.Traffic``. ``--latency`` adds a wait to every SQL
+query, like a database on another host; that wait is what async views
+can overlap. The cache is switched off unless ``--cache`` is given.
+
+Reported per path: requests per second, p50/p95/p99 latency and the
+number of answers other than 200.
+
+    python benchmarks/asgi.py --connections 64 --threads 8 --latency 2
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+import datagen  # noqa: E402
+from views import VIEWS, Traffic  # noqa: E402
+
+PATHS = ('wsgi', 'asgi')
+
+
+def slow_queries(latency):
+    """Make every query on connections opened from now on wait first."""
+    from django.db.backends.signals import connection_created
+
+    def wait(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if wait not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wait)
+    connection_created.connect(install, weak=False)
+
+
+def requests(traffic):
+    """Endless (path, cookie header) pairs of skewed requests."""
+    cookies = {}
+    while True:
+        client, url = traffic.request(traffic.rng.choice(VIEWS))
+        if id(client) not in cookies:
+            cookies[id(client)] = '; '.join(
+                f'{name}={morsel.value}'
+                for name, morsel in client.cookies.items()
+            )
+        yield url, cookies[id(client)]
+
+
+def call_wsgi(application, path, cookie):
+    status = []
+    response = application({
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SCRIPT_NAME': '', 'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1', 'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True,
+        'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(status[0].split()[0])
+
+
+async def call_asgi(application, path, cookie):
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application({
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }, receive, send)
+    return status[0]
+
+
+def load_wsgi(source, options):
+    from yatube.wsgi import application
+
+    lock = threading.Lock()
+    results = []
+    deadline = time.perf_counter() + options.seconds
+
+    def client(pool):
+        while time.perf_counter() < deadline:
+            with lock:
+                path, cookie = next(source)
+            started = time.perf_counter()
+            status = pool.submit(call_wsgi, application, path, cookie).result()
+            results.append((time.perf_counter() - started, status))
+
+    with ThreadPoolExecutor(options.threads) as pool:
+        clients = [threading.Thread(target=client, args=(pool,))
+                   for _ in range(options.connections)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+    return results
+
+
+def load_asgi(source, options):
+    from yatube.asgi import application
+
+    results = []
+
+    async def client(deadline):
+        while time.perf_counter() < deadline:
+            path, cookie = next(source)
+            started = time.perf_counter()
+            status = await call_asgi(application, path, cookie)
+            results.append((time.perf_counter() - started, status))
+
+    async def run():
+        deadline = time.perf_counter() + options.seconds
+        await asyncio.gather(*[client(deadline)
+                               for _ in range(options.connections)])
+    asyncio.run(run())
+    return results
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def child(options):
+    directory = tempfile.mkdtemp()
+    settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db')
+    settings.MEDIA_ROOT = os.path.join(directory, 'media')
+    if not options.cache:
+        settings.CACHES['default'] = {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connections
+
+    call_command('migrate', verbosity=0)
+    datagen.generate(
+        users=options.users, posts=options.posts,
+        comments=options.comments, seed=options.seed
+    )
+    traffic = Traffic(options.seed, options.logins)
+    connections.close_all()
+    if options.latency:
+        slow_queries(options.latency / 1000)
+    load = load_asgi if options.path == 'asgi' else load_wsgi
+    started = time.perf_counter()
+    results = load(requests(traffic), options)
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    print(json.dumps({
+        'rps': len(results) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'failed': sum(status != 200 for _, status in results),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='worker threads of the WSGI server')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds added to every SQL query')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the configured cache')
+    parser.add_argument('--db-profile', default='production',
+                        help='YATUBE_DB_PROFILE of both runs')
+    parser.add_argument('--path', choices=PATHS,
+                        help='run one path in this process')
+    options = parser.parse_args()
+    if options.path:
+        child(options)
+        return
+
+    print(f'{"path":<5} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"p99 ms":>8} {"failed":>7}')
+    for path in PATHS:
+        arguments = [
+            f'--{name.replace("_", "-")}={value}'
+            for name, value in vars(options).items()
+            if name not in ('path', 'cache', 'db_profile')
+        ]
+        output = subprocess.run(
+            [sys.executable, __file__, '--path', path, *arguments,
+             *(['--cache'] if options.cache else [])],
+            env={**os.environ, 'YATUBE_DB_PROFILE': options.db_profile,
+                 'YATUBE_ASYNC_VIEWS': '1' if path == 'asgi' else '0'},
+            check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f'{path:<5} {result["rps"]:>7.0f} {result["p50"]:>8.1f} '
+              f'{result["p95"]:>8.1f} {result["p99"]:>8.1f} '
+              f'{result["failed"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
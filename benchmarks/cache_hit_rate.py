@@ -0,0 +1,89 @@
+"""Cache hit rate of LocMemCache against the shared SQLiteCache.
+
+Every worker process plays a share of the same request log: page keys
+drawn from a Zipf-like distribution, a cache miss "renders" the page and
+stores it. With LocMemCache each worker warms its own copy, so the hit
+rate drops as workers are added; the shared cache keeps it flat.
+
+    python benchmarks/cache_hit_rate.py --requests 20000 --workers 1 4 16
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def request_log(requests, pages, seed=0):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, pages + 1)]
+    return rng.choices(range(pages), weights=weights, k=requests)
+
+
+def serve(args):
+    alias, keys, page_size = args
+    from django.core.cache import caches
+    cache = caches[alias]
+    body = 'x' * page_size
+    hits = 0
+    for key in keys:
+        if cache.get(f'page:{key}') is not None:
+            hits += 1
+        else:
+            cache.set(f'page:{key}', body, 3600)
+    return hits
+
+
+def run(alias, log, workers, page_size):
+    from django.core.cache import caches
+    caches[alias].clear()
+    shares = [(alias, log[index::workers], page_size)
+              for index in range(workers)]
+    started = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        hits = sum(pool.map(serve, shares))
+    return hits / len(log), len(log) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    settings.configure(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': options.pages},
+        },
+        'shared': {
+            'BACKEND': 'yatube.cache.SQLiteCache',
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            'OPTIONS': {'MAX_ENTRIES': options.pages},
+        },
+    })
+    django.setup()
+
+    log = request_log(options.requests, options.pages)
+    print(f'{"backend":<8} {"workers":>7} {"hit rate":>9} {"req/s":>9}')
+    for alias in ('locmem', 'shared'):
+        for workers in options.workers:
+            rate, throughput = run(alias, log, workers, options.page_size)
+            print(f'{alias:<8} {workers:>7} {rate:>9.1%} {throughput:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
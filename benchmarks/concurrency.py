@@ -0,0 +1,195 @@
+"""Mixed read/write traffic against the stock and production SQLite setup.
+
+Each profile runs in its own process (``YATUBE_DB_PROFILE`` is read when
+the settings load) on a fresh database: worker processes log in as
+random users and request the index, group, follow feed and post pages,
+and a share of them add comments and posts. The cache is switched off
+so that every request reaches the database. After each request a
+worker does what Django's handler does at the end of a request and
+closes connections older than ``CONN_MAX_AGE``.
+
+Reported per profile: requests per second, p50/p95 latency of reads
+and writes, and how many requests failed with "database is locked".
+
+    python benchmarks/concurrency.py --workers 8 --seconds 10 --writes 0.1
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+PROFILES = ('default', 'production')
+
+
+def seed(users, posts, rng):
+    from django.db import transaction
+
+    from posts.models import Comment, Follow, Group, Post, User
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            [User(username=f'user{index}') for index in range(users)]
+        )
+        Group.objects.bulk_create([
+            Group(title=f'Group {index}', slug=f'group{index}')
+            for index in range(10)
+        ])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        group_ids = list(Group.objects.values_list('id', flat=True))
+        Post.objects.bulk_create([
+            Post(text=f'Post {index}', author_id=rng.choice(user_ids),
+                 group_id=rng.choice(group_ids))
+            for index in range(posts)
+        ])
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        Comment.objects.bulk_create([
+            Comment(text='Comment', post_id=rng.choice(post_ids),
+                    author_id=rng.choice(user_ids))
+            for _ in range(posts)
+        ])
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id in user_ids
+             for author_id in rng.sample(user_ids, 10)
+             if author_id != user_id],
+            ignore_conflicts=True
+        )
+
+
+def work(args):
+    index, seconds, writes = args
+    from django.db import OperationalError, close_old_connections
+    from django.test import Client
+    from django.urls import reverse
+
+    from posts.models import Post, User
+
+    rng = random.Random(index)
+    client = Client()
+    users = list(User.objects.values_list('username', flat=True))
+    posts = list(Post.objects.values_list('id', 'author__username'))
+    client.force_login(User.objects.get(username=rng.choice(users)))
+    close_old_connections()
+    reads, written, locked = [], [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        post_id, author = rng.choice(posts)
+        write = rng.random() < writes
+        started = time.perf_counter()
+        try:
+            if not write:
+                client.get(rng.choice((
+                    reverse('index'),
+                    reverse('follow_index'),
+                    reverse('group_posts',
+                            kwargs={'slug': f'group{rng.randrange(10)}'}),
+                    reverse('post', kwargs={'username': author,
+                                            'post_id': post_id}),
+                )))
+            elif rng.random() < 0.8:
+                client.post(reverse('add_comment', kwargs={
+                    'username': author, 'post_id': post_id
+                }), {'text': 'Comment'})
+            else:
+                client.post(reverse('new_post'), {'text': 'Post'})
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+            continue
+        finally:
+            close_old_connections()
+        (written if write else reads).append(time.perf_counter() - started)
+    return reads, written, locked
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def child(options):
+    directory = tempfile.mkdtemp()
+    settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db')
+    settings.MEDIA_ROOT = os.path.join(directory, 'media')
+    settings.CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connections
+
+    call_command('migrate', verbosity=0)
+    seed(options.users, options.posts, random.Random(0))
+    connections.close_all()
+    started = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(options.workers) as pool:
+        results = pool.map(work, [
+            (index, options.seconds, options.writes)
+            for index in range(options.workers)
+        ])
+    elapsed = time.perf_counter() - started
+    reads = [value for result in results for value in result[0]]
+    writes = [value for result in results for value in result[1]]
+    print(json.dumps({
+        'rps': (len(reads) + len(writes)) / elapsed,
+        'read_p50': percentile(reads, 0.5),
+        'read_p95': percentile(reads, 0.95),
+        'write_p50': percentile(writes, 0.5),
+        'write_p95': percentile(writes, 0.95),
+        'locked': sum(result[2] for result in results),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writes', type=float, default=0.1,
+                        help='share of requests that write')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--profile', choices=PROFILES,
+                        help='run one profile in this process')
+    options = parser.parse_args()
+    if options.profile:
+        child(options)
+        return
+
+    print(f'{"profile":<11} {"req/s":>7} {"read p50":>9} {"read p95":>9} '
+          f'{"write p50":>10} {"write p95":>10} {"locked":>7}')
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile,
+             '--workers', str(options.workers),
+             '--seconds', str(options.seconds),
+             '--writes', str(options.writes),
+             '--users', str(options.users),
+             '--posts', str(options.posts)],
+            env={**os.environ, 'YATUBE_DB_PROFILE': profile},
+            check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f'{profile:<11} {result["rps"]:>7.0f} '
+              f'{result["read_p50"]:>9.1f} {result["read_p95"]:>9.1f} '
+              f'{result["write_p50"]:>10.1f} {result["write_p95"]:>10.1f} '
+              f'{result["locked"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Synthetic Yatube data with the skew of a real site.
+
+Objects are made by ``mixer`` without saving and written with
+``bulk_create``. Activity is skewed the way social sites are:
+
+* how much a user posts and comments follows a Pareto distribution, so
+  a few authors write most of the posts;
+* group popularity falls off as 1 / rank, and some posts have no group;
+* comments pile up on a minority of posts;
+* follows go to authors in proportion to their activity, so popular
+  authors collect followers, some past ``TIMELINE_FANOUT_LIMIT``.
+
+``bulk_create`` skips the signals, so the denormalized counters, user
+stats and follow timelines are filled in here the same way the signals
+would have.
+
+Needs Django set up on an empty database; see ``benchmarks/views.py``.
+"""
+import itertools
+import random
+from collections import Counter
+
+BATCH_SIZE = 500
+# Shape of the activity distribution; 1.16 gives the 80/20 rule.
+PARETO_ALPHA = 1.16
+
+
+def pareto_weights(rng, count):
+    return [rng.paretovariate(PARETO_ALPHA) for _ in range(count)]
+
+
+def saved(model, objects, field):
+    """Save ``objects`` and return them re-read in the same order."""
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    by_key = model.objects.in_bulk(
+        [getattr(obj, field) for obj in objects], field_name=field
+    )
+    return [by_key[getattr(obj, field)] for obj in objects]
+
+
+def generate(users=1000, groups=20, posts=20000, comments=50000,
+             follows=20, seed=0):
+    """Fill the database; return the counts of what was made."""
+    from django.conf import settings
+    from django.db import transaction
+    from mixer.backend.django import Mixer
+
+    from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                              User, UserStats)
+
+    rng = random.Random(seed)
+    mixer = Mixer(commit=False)
+    mixer.faker.seed_instance(seed)
+    with transaction.atomic():
+        user_list = saved(User, mixer.cycle(users).blend(
+            User, username=mixer.sequence('user{0}'), password='!'
+        ), 'username')
+        group_list = saved(Group, mixer.cycle(groups).blend(
+            Group, slug=mixer.sequence('group{0}')
+        ), 'slug')
+
+        activity = pareto_weights(rng, users)
+        group_weights = [1 / rank for rank in range(1, groups + 1)] + [
+            sum(1 / rank for rank in range(1, groups + 1)) / 2
+        ]
+        post_authors = rng.choices(user_list, weights=activity, k=posts)
+        post_groups = rng.choices(
+            group_list + [None], weights=group_weights, k=posts
+        )
+        commented = rng.choices(
+            range(posts), weights=pareto_weights(rng, posts), k=comments
+        )
+        counts = Counter(commented)
+        for start in range(0, posts, BATCH_SIZE):
+            batch = range(start, min(start + BATCH_SIZE, posts))
+            objects = mixer.cycle(len(batch)).blend(
+                Post,
+                author=(post_authors[index] for index in batch),
+                group=(post_groups[index] for index in batch),
+                comments_count=(counts[index] for index in batch),
+                text=mixer.faker.text,
+                image='', image_variants='', version=0,
+            )
+            Post.objects.bulk_create(objects)
+        # bulk_create leaves pk unset on SQLite; read the posts back.
+        post_list = list(Post.objects.order_by('pk'))
+
+        comment_authors = rng.choices(user_list, weights=activity,
+                                      k=comments)
+        for start in range(0, comments, BATCH_SIZE):
+            batch = range(start, min(start + BATCH_SIZE, comments))
+            Comment.objects.bulk_create(mixer.cycle(len(batch)).blend(
+                Comment,
+                post=(post_list[commented[index]] for index in batch),
+                author=(comment_authors[index] for index in batch),
+                text=mixer.faker.sentence,
+            ))
+
+        # Follows per user are skewed too, with ``follows`` the median.
+        median = 2 ** (1 / PARETO_ALPHA)
+        cumulative = list(itertools.accumulate(activity))
+        edges = set()
+        for user in user_list:
+            wanted = min(
+                round(follows * rng.paretovariate(PARETO_ALPHA) / median),
+                users - 1
+            )
+            chosen = set()
+            while len(chosen) < wanted:
+                for author in rng.choices(user_list, cum_weights=cumulative,
+                                          k=wanted * 2):
+                    if author.pk != user.pk and len(chosen) < wanted:
+                        chosen.add(author.pk)
+            edges.update((user.pk, author_id) for author_id in chosen)
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in edges),
+            batch_size=BATCH_SIZE
+        )
+
+        UserStats.objects.rebuild_all()
+        UserStats.objects.filter(
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).update(fan_out=False)
+        pulled = set(UserStats.objects.filter(
+            fan_out=False
+        ).values_list('user_id', flat=True))
+        by_author = {}
+        for post in post_list:
+            by_author.setdefault(post.author_id, []).append(post)
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, post=post,
+                           pub_date=post.pub_date)
+             for user_id, author_id in edges if author_id not in pulled
+             for post in by_author.get(author_id, ())),
+            batch_size=BATCH_SIZE
+        )
+    return {
+        'users': users, 'groups': groups, 'posts': posts,
+        'comments': comments, 'follows': len(edges),
+    }
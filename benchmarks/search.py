@@ -0,0 +1,124 @@
+"""FTS5 search against the admin's ``icontains`` scan.
+
+Fills a throwaway database with posts of random words (word frequencies
+follow a Zipf-like curve, so there are common and rare terms), then
+times the first and a deep page of ``SearchPaginator`` against the
+``LIKE '%…%'`` query that ``PostAdmin.search_fields`` runs.
+
+    python benchmarks/search.py --posts 1000000 --rounds 5
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+VOCABULARY = [f'w{index}' for index in range(20000)]
+CUMULATIVE = list(itertools.accumulate(
+    1 / rank for rank in range(1, len(VOCABULARY) + 1)
+))
+
+
+def words(rng, count):
+    return rng.choices(VOCABULARY, cum_weights=CUMULATIVE, k=count)
+
+
+def fill(posts, seed=0):
+    from django.db import transaction
+
+    from posts.models import Group, Post, User
+
+    rng = random.Random(seed)
+    User.objects.bulk_create(
+        [User(username=f'author{index}') for index in range(100)]
+    )
+    Group.objects.bulk_create([
+        Group(title=f'Group {index}', slug=f'group{index}')
+        for index in range(20)
+    ])
+    authors = list(User.objects.values_list('id', flat=True))
+    groups = list(Group.objects.values_list('id', flat=True))
+    started = time.perf_counter()
+    for start in range(0, posts, 10000):
+        batch = min(10000, posts - start)
+        with transaction.atomic():
+            Post.objects.bulk_create([
+                Post(
+                    text=' '.join(words(rng, rng.randint(5, 60))),
+                    author_id=rng.choice(authors),
+                    group_id=rng.choice(groups + [None]),
+                )
+                for _ in range(batch)
+            ])
+    return time.perf_counter() - started
+
+
+def timed(function, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--terms', nargs='+', default=['w3', 'w300', 'w9000'])
+    parser.add_argument('--depth', type=int, default=10,
+                        help='page reached by following cursors')
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db')
+    django.setup()
+
+    from django.core.management import call_command
+
+    from posts.models import Post
+    from posts.search import SearchPaginator
+
+    call_command('migrate', verbosity=0)
+    print(f'inserted {options.posts} posts '
+          f'in {fill(options.posts):.1f} s')
+
+    def deep_page(term):
+        paginator = SearchPaginator(Post.objects.all(), 10, term)
+        page = paginator.cursor_page()
+        for _ in range(options.depth - 1):
+            if not page.next_cursor:
+                break
+            page = paginator.cursor_page(after=page.next_cursor)
+        return len(page)
+
+    print(f'{"term":<8} {"matches":>8} {"icontains ms":>13} '
+          f'{"fts page 1 ms":>14} {"fts page " + str(options.depth):>12}')
+    for term in options.terms:
+        like_ms, matches = timed(
+            lambda: Post.objects.filter(text__icontains=term).count(),
+            options.rounds
+        )
+        first_ms, _ = timed(
+            lambda: len(SearchPaginator(
+                Post.objects.all(), 10, term
+            ).cursor_page()),
+            options.rounds
+        )
+        deep_ms, _ = timed(lambda: deep_page(term), options.rounds)
+        print(f'{term:<8} {matches:>8} {like_ms:>13.1f} '
+              f'{first_ms:>14.1f} {deep_ms:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
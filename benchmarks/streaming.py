@@ -0,0 +1,136 @@
+"""Time to first byte and memory of rendered versus streamed pages.
+
+Fills a throwaway database with ``datagen.generate`` and requests the
+group, profile, follow and post pages with ``STREAM_PAGES`` off and on,
+replaying the same skewed requests in both modes (see
+``benchmarks/views.py``). The cache is replaced with a dummy one, so
+that every card is rendered.
+
+Per view and mode it reports p50/p95 time to the first chunk of the
+response and to its last, and the peak of memory allocated while one
+response is produced and read (a separate pass under ``tracemalloc``).
+The chunks are dropped as they arrive, the way a server writes them to
+the socket.
+
+    python benchmarks/streaming.py --posts 20000 --requests 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+import datagen  # noqa: E402
+from views import Traffic  # noqa: E402
+
+VIEWS = ('group_posts', 'profile', 'post', 'follow_index')
+MODES = {'rendered': False, 'streamed': True}
+
+
+def fetch(client, url):
+    """Milliseconds to the first and the last byte of ``url``."""
+    started = time.perf_counter()
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} answered {response.status_code}')
+    if response.streaming:
+        chunks = iter(response.streaming_content)
+        next(chunks, None)
+        first = time.perf_counter() - started
+        for _ in chunks:
+            pass
+    else:
+        response.content
+        first = time.perf_counter() - started
+    return first * 1000, (time.perf_counter() - started) * 1000
+
+
+def measure(traffic, view, requests, warmup, traced):
+    for _ in range(warmup):
+        fetch(*traffic.request(view))
+    firsts, lasts = [], []
+    for _ in range(requests):
+        first, last = fetch(*traffic.request(view))
+        firsts.append(first)
+        lasts.append(last)
+    peaks = []
+    tracemalloc.start()
+    for _ in range(traced):
+        client, url = traffic.request(view)
+        tracemalloc.reset_peak()
+        fetch(client, url)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+    tracemalloc.stop()
+    first_cuts = statistics.quantiles(firsts, n=100, method='inclusive')
+    last_cuts = statistics.quantiles(lasts, n=100, method='inclusive')
+    return {
+        'ttfb_p50_ms': first_cuts[49], 'ttfb_p95_ms': first_cuts[94],
+        'total_p50_ms': last_cuts[49], 'total_p95_ms': last_cuts[94],
+        'peak_kib': max(peaks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=50000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=100,
+                        help='timed requests per view and mode')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--traced', type=int, default=10,
+                        help='requests per view and mode under tracemalloc')
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--views', nargs='+', choices=VIEWS, default=VIEWS)
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db')
+    settings.MEDIA_ROOT = os.path.join(directory, 'media')
+    settings.CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    counts = datagen.generate(
+        users=options.users, groups=options.groups, posts=options.posts,
+        comments=options.comments, follows=options.follows,
+        seed=options.seed
+    )
+    print(f'generated {counts}')
+
+    traffic = Traffic(options.seed, options.logins)
+    print(f'{"view":<13} {"mode":<9} {"ttfb p50":>9} {"ttfb p95":>9} '
+          f'{"all p50":>8} {"all p95":>8} {"peak KiB":>9}')
+    for view in options.views:
+        for mode, streamed in MODES.items():
+            # Both modes replay the same requests.
+            traffic.rng = random.Random(options.seed)
+            settings.STREAM_PAGES = streamed
+            figures = measure(traffic, view, options.requests,
+                              options.warmup, options.traced)
+            print(f'{view:<13} {mode:<9} {figures["ttfb_p50_ms"]:>9.2f} '
+                  f'{figures["ttfb_p95_ms"]:>9.2f} '
+                  f'{figures["total_p50_ms"]:>8.2f} '
+                  f'{figures["total_p95_ms"]:>8.2f} '
+                  f'{figures["peak_kib"]:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
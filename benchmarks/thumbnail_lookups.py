@@ -0,0 +1,97 @@
+"""Thumbnail lookups per card against one batched lookup per page.
+
+Builds posts with real images in a throwaway database, generates their
+thumbnails, then times ``thumbnails.lookup`` called once per card (what
+``{% ready_thumbnail %}`` did on its own) against ``lookup_many`` for
+the whole page, with the cache cold and warm.
+
+    python benchmarks/thumbnail_lookups.py --sizes 10 50 100 --rounds 20
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def make_posts(count):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    from posts import thumbnails
+    from posts.models import Post, User
+
+    author = User.objects.create(username='bench')
+    posts = []
+    for index in range(count):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), (index % 256, 90, 160)).save(
+            buffer, 'JPEG'
+        )
+        post = Post.objects.create(
+            author=author, text=f'Post {index}',
+            image=SimpleUploadedFile(f'bench{index}.jpg', buffer.getvalue())
+        )
+        thumbnails.generate(post.pk, post.image.name)
+        posts.append(post)
+    return posts
+
+
+def measure(lookup, page, rounds, cold):
+    from django.core.cache import cache
+    from django.db import connection, reset_queries
+
+    elapsed = queries = 0
+    for _ in range(rounds):
+        if cold:
+            cache.clear()
+        reset_queries()
+        started = time.perf_counter()
+        lookup(page)
+        elapsed += time.perf_counter() - started
+        queries += len(connection.queries)
+    return elapsed / rounds * 1000, queries / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--rounds', type=int, default=20)
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db')
+    settings.MEDIA_ROOT = directory
+    settings.DEBUG = True
+    django.setup()
+
+    from django.core.management import call_command
+
+    from posts import thumbnails
+
+    call_command('migrate', verbosity=0)
+    posts = make_posts(max(options.sizes))
+    ways = {
+        'per-tag': lambda page: [thumbnails.lookup(p.image) for p in page],
+        'batched': lambda page: thumbnails.lookup_many(p.image for p in page),
+    }
+    print(f'{"images":>6} {"cache":<5} {"lookup":<8} {"ms":>8} {"queries":>8}')
+    for size in options.sizes:
+        for cold in (True, False):
+            for name, lookup in ways.items():
+                ms, queries = measure(
+                    lookup, posts[:size], options.rounds, cold
+                )
+                print(f'{size:>6} {"cold" if cold else "warm":<5} '
+                      f'{name:<8} {ms:>8.2f} {queries:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Latency, queries and memory of the feed views on generated data.
+
+Fills a throwaway database with ``datagen.generate`` and requests the
+index, group, profile, post and follow pages through the test client,
+picking groups, authors and posts as skewed as the data itself and
+logging in as a rotating set of users. The cache is replaced with a
+dummy one unless ``--cache`` is given, so the numbers are those of
+rendering a page, not of reading it back.
+
+Per view it reports p50/p95/p99 latency, queries per request and the
+peak of memory allocated by one request (a separate pass under
+``tracemalloc``, which would distort the timings). ``--output`` saves
+the results as JSON; ``--compare`` checks them against a saved run and
+exits with status 1 if a view got slower, or issued more queries or
+allocated more memory, by more than ``--threshold``.
+
+    python benchmarks/views.py --posts 20000 --output base.json
+    python benchmarks/views.py --posts 20000 --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+import datagen  # noqa: E402
+
+VIEWS = ('index', 'group_posts', 'profile', 'post', 'follow_index')
+# Compared by --compare; larger is worse for all of them.
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_max', 'peak_kib')
+
+
+class Traffic:
+    """Random requests to each view, skewed towards popular content."""
+
+    def __init__(self, seed, logins):
+        from django.db.models import Count
+        from django.test import Client
+
+        from posts.models import Group, Post, User
+
+        self.rng = random.Random(seed)
+        self.groups = list(Group.objects.annotate(
+            weight=Count('posts')
+        ).values_list('slug', 'weight'))
+        self.authors = list(User.objects.filter(
+            stats__posts_count__gt=0
+        ).values_list('username', 'stats__posts_count'))
+        self.posts = list(Post.objects.values_list('id', 'author__username'))
+        self.anonymous = Client()
+        self.clients = []
+        for user in User.objects.filter(
+                stats__following_count__gt=0).order_by('?')[:logins]:
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+
+    def pick(self, pairs):
+        values, weights = zip(*pairs)
+        return self.rng.choices(values, weights=weights)[0]
+
+    def request(self, view):
+        """Client and URL of a request to ``view``."""
+        from django.urls import reverse
+
+        client = (self.rng.choice(self.clients)
+                  if self.rng.random() < 0.5 else self.anonymous)
+        if view == 'index':
+            return client, reverse('index')
+        if view == 'group_posts':
+            return client, reverse(
+                'group_posts', kwargs={'slug': self.pick(self.groups)}
+            )
+        if view == 'profile':
+            return client, reverse(
+                'profile', kwargs={'username': self.pick(self.authors)}
+            )
+        if view == 'post':
+            post_id, author = self.rng.choice(self.posts)
+            return client, reverse(
+                'post', kwargs={'username': author, 'post_id': post_id}
+            )
+        return self.rng.choice(self.clients), reverse('follow_index')
+
+
+def quantiles(values):
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50_ms': cuts[49], 'p95_ms': cuts[94], 'p99_ms': cuts[98]}
+
+
+def measure(traffic, view, requests, warmup, traced):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        client, url = traffic.request(view)
+        client.get(url)
+    latencies, queries = [], []
+    for _ in range(requests):
+        client, url = traffic.request(view)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} answered {response.status_code}')
+        queries.append(len(captured))
+    peaks = []
+    tracemalloc.start()
+    for _ in range(traced):
+        client, url = traffic.request(view)
+        tracemalloc.reset_peak()
+        client.get(url)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+    tracemalloc.stop()
+    return {
+        **quantiles(latencies),
+        'mean_ms': statistics.mean(latencies),
+        'queries_mean': statistics.mean(queries),
+        'queries_max': max(queries),
+        'peak_kib': max(peaks),
+        'requests': requests,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every compared figure; return regressions."""
+    regressions = []
+    print(f'\n{"view":<13} {"figure":<12} {"before":>9} {"after":>9} '
+          f'{"change":>8}')
+    for view, figures in results['views'].items():
+        before = baseline['views'].get(view)
+        if before is None:
+            continue
+        for figure in COMPARED:
+            old, new = before[figure], figures[figure]
+            change = (new - old) / old if old else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((view, figure))
+            print(f'{view:<13} {figure:<12} {old:>9.1f} {new:>9.1f} '
+                  f'{change:>+8.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=50000)
+    parser.add_argument('--follows', type=int, default=20,
+                        help='median number of authors a user follows')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='timed requests per view')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--traced', type=int, default=10,
+                        help='requests per view under tracemalloc')
+    parser.add_argument('--logins', type=int, default=20,
+                        help='users the logged-in requests rotate through')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--views', nargs='+', choices=VIEWS, default=VIEWS)
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the configured cache')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--compare', help='results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed growth before a figure regresses')
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db')
+    settings.MEDIA_ROOT = os.path.join(directory, 'media')
+    if not options.cache:
+        settings.CACHES['default'] = {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    counts = datagen.generate(
+        users=options.users, groups=options.groups, posts=options.posts,
+        comments=options.comments, follows=options.follows,
+        seed=options.seed
+    )
+    print(f'generated {counts} in {time.perf_counter() - started:.1f} s')
+
+    traffic = Traffic(options.seed, options.logins)
+    results = {
+        'meta': {
+            'data': counts,
+            'requests': options.requests,
+            'cache': options.cache,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'views': {},
+    }
+    print(f'{"view":<13} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"queries":>8} {"max q":>6} {"peak KiB":>9}')
+    for view in options.views:
+        figures = measure(traffic, view, options.requests, options.warmup,
+                          options.traced)
+        results['views'][view] = figures
+        print(f'{view:<13} {figures["p50_ms"]:>8.2f} '
+              f'{figures["p95_ms"]:>8.2f} {figures["p99_ms"]:>8.2f} '
+              f'{figures["queries_mean"]:>8.1f} {figures["queries_max"]:>6} '
+              f'{figures["peak_kib"]:>9.0f}')
+
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, options.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Плагин pytest: бюджет запросов к базе для каждого маршрута posts.
+
+Бюджет объявляется у представления декоратором
+``yatube.metrics.query_budget``. Тест ``test_query_budget`` открывает
+каждый именованный маршрут из ``posts/urls.py`` на двух объёмах данных
+(одна запись и полная страница записей с комментариями) и проверяет, что
+число запросов не выше бюджета и не растёт вместе с объёмом данных.
+В конце прогона печатается таблица числа запросов по маршрутам: на
+каждый объём первое и повторное обращение.
+"""
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+
+PAGE = 10
+# Объём данных: (записей автора с картинкой, комментариев к первой).
+SIZES = {'small': (1, 1), 'large': (PAGE * 2, PAGE * 2)}
+
+_report = {}
+
+
+def _fresh_post(site):
+    return site.mixer.blend('posts.Post', author=site.author).pk
+
+
+def _fresh_comment(site):
+    return site.mixer.blend(
+        'posts.Comment', post=site.post, author=site.reader
+    ).pk
+
+
+def _unfollowed(site):
+    from posts.models import Follow
+    Follow.objects.filter(user=site.reader, author=site.other).delete()
+    return {'username': site.other.username}
+
+
+def _newcomer(site):
+    """Новый пользователь подписывается на автора с записями."""
+    from posts.models import User
+    site.newcomer = site.mixer.blend(User)
+    return {'username': site.author.username}
+
+
+def _followed(site):
+    from posts.models import Follow
+    Follow.objects.get_or_create(user=site.reader, author=site.other)
+    return {'username': site.other.username}
+
+
+def _post(site):
+    return {'username': site.author.username, 'post_id': site.post.pk}
+
+
+# Маршрут: (метод, пользователь, аргументы URL, данные запроса).
+# Аргументы вычисляются до подсчёта, поэтому могут готовить данные.
+# Ключ ``маршрут:вариант`` описывает ещё одно обращение к маршруту.
+ROUTES = {
+    'index': ('get', 'reader', lambda site: {}, None),
+    'group_posts': ('get', 'reader',
+                    lambda site: {'slug': site.group.slug}, None),
+    'new_post': ('post', 'author', lambda site: {},
+                 lambda site: {'text': 'Новая запись', 'group': site.group.pk}),
+    'follow_index': ('get', 'reader', lambda site: {}, None),
+    'search': ('get', 'reader', lambda site: {},
+               lambda site: {'q': 'запись'}),
+    'export': ('get', 'staff', lambda site: {}, None),
+    'delete_post': ('get', 'author',
+                    lambda site: {'post_id': _fresh_post(site)}, None),
+    'delete_comment': ('get', 'author',
+                       lambda site: {'comment_id': _fresh_comment(site)},
+                       None),
+    'profile': ('get', 'reader',
+                lambda site: {'username': site.author.username}, None),
+    'profile_follow': ('get', 'reader', _unfollowed, None),
+    'profile_follow:newcomer': ('get', 'newcomer', _newcomer, None),
+    'profile_unfollow': ('get', 'reader', _followed, None),
+    'post': ('get', 'reader', _post, None),
+    'comments': ('get', 'reader', _post, None),
+    'add_comment': ('post', 'reader', _post,
+                    lambda site: {'text': 'Комментарий'}),
+    'edit': ('post', 'author', _post,
+             lambda site: {'text': 'Изменённая запись',
+                           'group': site.group.pk}),
+}
+
+
+def route(name):
+    """Имя маршрута ``posts/urls.py`` по ключу ``ROUTES``."""
+    return name.split(':')[0]
+
+
+def budgets():
+    """Бюджеты именованных маршрутов ``posts/urls.py``, ``None`` — нет."""
+    from posts.urls import urlpatterns
+    return {
+        pattern.name: getattr(pattern.callback, 'query_budget', None)
+        for pattern in urlpatterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    }
+
+
+class Site:
+    """Авторы, группа и записи; ``grow`` доводит их до объёма."""
+
+    def __init__(self, mixer):
+        from posts.models import User
+
+        self.mixer = mixer
+        self.author = mixer.blend(User, username='author')
+        self.reader = mixer.blend(User, username='reader')
+        self.other = mixer.blend(User, username='other')
+        self.staff = mixer.blend(User, username='staff', is_staff=True)
+        self.group = mixer.blend('posts.Group', slug='group')
+        mixer.blend('posts.Follow', user=self.reader, author=self.author)
+        self.post = None
+        self.posts = self.comments = 0
+
+    def grow(self, size):
+        posts, comments = SIZES[size]
+        created = self.mixer.cycle(posts - self.posts).blend(
+            'posts.Post', author=self.author, group=self.group,
+            text=self.mixer.sequence('Тестовая запись {0}'),
+            image='posts/seed.jpg'
+        )
+        self.post = self.post or created[0]
+        self.mixer.cycle(comments - self.comments).blend(
+            'posts.Comment', post=self.post, author=self.reader,
+            text=self.mixer.sequence('Комментарий {0}')
+        )
+        self.posts, self.comments = posts, comments
+
+
+@pytest.fixture
+def site(mixer):
+    return Site(mixer)
+
+
+@pytest.fixture
+def count_queries(client, site):
+    """Число запросов первого и повторного обращения к маршруту ``name``.
+
+    Первое обращение ещё заполняет сессию и счётчики пользователей, так
+    что с объёмом данных сравнивается повторное. Кэш перед каждым
+    обращением очищается.
+    """
+    def request(name):
+        from django.urls import reverse
+
+        method, user, kwargs, data = ROUTES[name]
+        url = reverse(route(name), kwargs=kwargs(site))
+        client.force_login(getattr(site, user))
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data and data(site))
+            if response.streaming:
+                b''.join(response.streaming_content)
+        assert response.status_code < 400, (
+            f'Маршрут `{name}` вернул код {response.status_code}'
+        )
+        return len(queries)
+
+    def count(name):
+        return request(name), request(name)
+    return count
+
+
+def record(name, counts, budget):
+    _report[name] = (counts, budget)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _report:
+        return
+    terminalreporter.section('бюджет запросов')
+    sizes = ' '.join(f'{size:>13}' for size in SIZES)
+    terminalreporter.write_line(f'{"маршрут":<24} {sizes} {"бюджет":>7}')
+    for name, (counts, budget) in sorted(_report.items()):
+        counts = ' '.join(f'{cold:>6} {warm:>6}' for cold, warm in counts)
+        terminalreporter.write_line(f'{name:<24} {counts} {budget!s:>7}')
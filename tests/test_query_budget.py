@@ -0,0 +1,34 @@
+import pytest
+
+from tests.query_budget import ROUTES, SIZES, budgets, record, route
+
+
+class TestQueryBudget:
+
+    @pytest.mark.parametrize('name', sorted(budgets()))
+    def test_route_has_budget(self, name):
+        assert name in ROUTES, (
+            f'Опишите обращение к маршруту `{name}` в `tests/query_budget.py`'
+        )
+        assert budgets()[name] is not None, (
+            f'Объявите бюджет запросов маршрута `{name}` '
+            f'декоратором `query_budget`'
+        )
+
+    @pytest.mark.django_db(transaction=False)
+    @pytest.mark.parametrize('name', sorted(ROUTES))
+    def test_query_budget(self, name, site, count_queries):
+        counts = []
+        for size in SIZES:
+            site.grow(size)
+            counts.append(count_queries(name))
+        budget = budgets()[route(name)]
+        record(name, counts, budget)
+        most = max(max(pair) for pair in counts)
+        assert budget is not None and most <= budget, (
+            f'Маршрут `{name}` выполнил {most} запросов при бюджете {budget}'
+        )
+        assert counts[0][1] == counts[-1][1], (
+            f'Число запросов маршрута `{name}` растёт вместе с данными: '
+            f'{counts}'
+        )
@@ -0,0 +1,160 @@
+"""Async versions of the read-heavy pages, served under ASGI.
+
+The ORM of Django 3.2 is synchronous, so these views hand their
+database and cache work to threads and wait for it without holding a
+worker. Reads that do not depend on each other (the author and its
+counters, a page of posts or comments, the authors the viewer follows)
+start together with ``asyncio.gather``, each in a worker thread with a
+connection of its own; the page is then rendered in the thread of the
+request. ``STREAM_PAGES`` does not apply to them.
+
+``posts/urls.py`` routes to these views when ``ASYNC_VIEWS`` is on,
+which ``yatube/asgi.py`` does by default.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render
+from yatube.metrics import query_budget
+from yatube.replicas import replica_reads
+
+from . import groups, relations, usernames, views
+from .cards import prefetch_cards
+from .forms import CommentForm
+from .models import Post, User
+from .paginator import paginate
+from .timeline import TimelinePaginator
+
+# Work that needs the request's own connection, session or user.
+in_request_thread = sync_to_async
+# The loop's default executor has a handful of threads; the reads of
+# all requests share these instead.
+readers = ThreadPoolExecutor(settings.ASYNC_READ_THREADS,
+                             thread_name_prefix='async-read')
+
+
+def read(func):
+    """``func`` as a coroutine run in a worker thread of its own.
+
+    Like at the end of a request, the thread's connection is closed
+    afterwards once it is older than ``CONN_MAX_AGE``.
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False, executor=readers)
+
+
+def authenticated(request):
+    # Loads the lazy user once, before the reads that look at it.
+    return request.user.is_authenticated
+
+
+def feed_page(request, posts_list, **kwargs):
+    page = paginate(request, posts_list, **kwargs)
+    prefetch_cards(page)
+    return page
+
+
+@query_budget(6)
+async def index(request):
+    # Nearly always answered from the page cache of the sync view.
+    return await in_request_thread(views.index)(request)
+
+
+@query_budget(6)
+@replica_reads
+async def group_posts(request, slug):
+    group, _ = await asyncio.gather(
+        read(groups.by_slug)(slug),
+        in_request_thread(authenticated)(request),
+    )
+    if group is None:
+        raise Http404('Такой группы нет')
+    page, _ = await asyncio.gather(
+        read(feed_page)(
+            request, Post.objects.for_feed().filter(group_id=group.pk)
+        ),
+        read(relations.followed_ids)(request),
+    )
+    return await in_request_thread(render)(
+        request,
+        'posts/group.html',
+        {'group': group, 'page': page}
+    )
+
+
+@query_budget(7)
+@replica_reads
+async def profile(request, username):
+    author_id, _ = await asyncio.gather(
+        read(usernames.user_id_or_404)(username),
+        in_request_thread(authenticated)(request),
+    )
+    author, page, _ = await asyncio.gather(
+        read(get_object_or_404)(
+            User.objects.select_related('stats'), pk=author_id
+        ),
+        read(feed_page)(
+            request, Post.objects.for_feed().filter(author_id=author_id)
+        ),
+        read(relations.followed_ids)(request),
+    )
+    return await in_request_thread(render)(
+        request,
+        'posts/profile.html',
+        {'author': author, 'page': page}
+    )
+
+
+@query_budget(7)
+@replica_reads
+async def post_view(request, username, post_id):
+    author_id, _ = await asyncio.gather(
+        read(usernames.user_id_or_404)(username),
+        in_request_thread(authenticated)(request),
+    )
+    post, comments, _ = await asyncio.gather(
+        read(get_object_or_404)(
+            Post.objects.select_related('author', 'author__stats'),
+            id=post_id, author_id=author_id
+        ),
+        read(views.comment_page)(request, post_id),
+        read(relations.followed_ids)(request),
+    )
+    return await in_request_thread(render)(
+        request,
+        'posts/post.html',
+        {'post': post,
+         'form': CommentForm(),
+         'comments': comments}
+    )
+
+
+@query_budget(7)
+@replica_reads
+async def follow_index(request):
+    if not await in_request_thread(authenticated)(request):
+        return redirect_to_login(request.get_full_path())
+    page, _ = await asyncio.gather(
+        read(feed_page)(
+            request,
+            Post.objects.for_feed().filter(
+                author__following__user=request.user
+            ),
+            paginator_class=TimelinePaginator, user=request.user
+        ),
+        read(relations.followed_ids)(request),
+    )
+    return await in_request_thread(render)(
+        request,
+        'posts/follow.html',
+        {'page': page, 'paginator': page.paginator}
+    )
@@ -0,0 +1,70 @@
+"""Versioned caching of the feeds.
+
+Cached entries are stored under a key prefix that embeds a version
+number. Bumping the version makes every old entry unreachable at once,
+so pages can be cached for hours and still change as soon as the data
+behind them does. Only the parts that are the same for every viewer are
+cached this way; see ``cached_cursor_page``.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from yatube.replicas import primary_reads
+
+from .paginator import page_state, paginate, restore_page
+
+INDEX_PAGE = 'index_page'
+
+
+def _version_key(prefix):
+    return f'{prefix}:version'
+
+
+def get_version(prefix):
+    version = cache.get(_version_key(prefix))
+    if version is None:
+        # Seeding from the clock never reuses the version of entries
+        # that outlived an evicted counter.
+        cache.add(_version_key(prefix), int(time.time() * 1000), None)
+        version = cache.get(_version_key(prefix))
+    return version
+
+
+def _incr(prefix):
+    try:
+        cache.incr(_version_key(prefix))
+    except ValueError:
+        get_version(prefix)
+
+
+def bump_version(prefix):
+    _incr(prefix)
+    # A page rendered before the transaction commits could be stored
+    # under the new version with the old rows; bump once more after it.
+    transaction.on_commit(lambda: _incr(prefix))
+
+
+def versioned_key(prefix, *parts):
+    """Cache key of ``parts`` under the current version of ``prefix``."""
+    digest = hashlib.md5('\n'.join(parts).encode()).hexdigest()
+    return f'{prefix}.{get_version(prefix)}:{digest}'
+
+
+def cached_cursor_page(request, prefix, object_list, timeout):
+    """``paginate(request, object_list)``, kept under ``prefix``'s version.
+
+    Only the rows and the cursors are stored: they are the same for
+    every viewer. The page around them is rendered for each request.
+    """
+    key = versioned_key(
+        prefix, request.GET.get('after', ''), request.GET.get('before', '')
+    )
+    state = cache.get(key)
+    if state is not None:
+        return restore_page(state)
+    with primary_reads():
+        page = paginate(request, object_list)
+    cache.set(key, page_state(page), timeout)
+    return page
@@ -0,0 +1,59 @@
+"""Cached rendering of post cards.
+
+The body of a card is the same for every viewer, so it is rendered once
+per ``Post.version`` and kept in the cache. Only the owner controls are
+rendered per request and put in place of ``OWNER_CONTROLS``; other
+signed-in viewers get a follow button there instead.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import groups, relations, thumbnails
+
+BODY_TEMPLATE = 'posts/includes/post_card_body.html'
+OWNER_TEMPLATE = 'posts/includes/post_owner_controls.html'
+FOLLOW_TEMPLATE = 'posts/includes/follow_button.html'
+OWNER_CONTROLS = '<!--owner-controls-->'
+
+
+def card_key(post):
+    return f'post_card:{post.pk}:{post.version}'
+
+
+def prefetch_cards(posts):
+    """Set ``card_html`` on every post, with one cache round trip."""
+    posts = {card_key(post): post for post in posts}
+    cached = cache.get_many(list(posts))
+    stale = [post for key, post in posts.items() if key not in cached]
+    groups.attach(stale)
+    # The cards about to be rendered look up their thumbnails together.
+    ready = thumbnails.lookup_many(post.image for post in stale)
+    for post in stale:
+        post.thumbnail = ready.get(post.image.name)
+    rendered = {}
+    for key, post in posts.items():
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string(
+                BODY_TEMPLATE, {'post': post}
+            )
+        post.card_html = html
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+
+
+def render_card(post, user, request=None):
+    if not hasattr(post, 'card_html'):
+        prefetch_cards([post])
+    controls = ''
+    if user == post.author:
+        controls = render_to_string(OWNER_TEMPLATE, {'post': post})
+    elif request is not None and request.user.is_authenticated:
+        controls = render_to_string(FOLLOW_TEMPLATE, {
+            'author': post.author,
+            'following': relations.is_following(request, post.author_id),
+            'size': 'btn-sm',
+        })
+    return mark_safe(post.card_html.replace(OWNER_CONTROLS, controls))
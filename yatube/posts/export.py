@@ -0,0 +1,91 @@
+"""Streaming dumps of groups, posts, comments and follows.
+
+Rows are read with ``values_list(...).iterator()`` and written out one
+line at a time, so a dump of any size holds one chunk of rows in memory.
+Related objects are exported by their natural keys (username, group
+slug). ``import_posts`` reads the post rows of a JSONL dump back (a
+CSV dump of posts too) and skips rows of the other types; comments
+point at the ids of the dumped posts and cannot be matched to the new
+ones.
+"""
+import csv
+import json
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+
+TABLES = {
+    'groups': (Group, {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'posts': (Post, {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    'comments': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def rows(table, chunk_size=CHUNK_SIZE):
+    """Dicts of every row of ``table`` in primary key order."""
+    model, columns = TABLES[table]
+    values = model.objects.order_by('pk').values_list(*columns.values())
+    for row in values.iterator(chunk_size=chunk_size):
+        yield {
+            name: value.isoformat() if hasattr(value, 'isoformat') else value
+            for name, value in zip(columns, row)
+        }
+
+
+def jsonl(tables, chunk_size=CHUNK_SIZE):
+    """JSON lines of ``tables``, each tagged with its table name."""
+    for table in tables:
+        for row in rows(table, chunk_size):
+            yield json.dumps(
+                {'type': table[:-1], **row}, ensure_ascii=False
+            ) + '\n'
+
+
+class Echo:
+    """File-like object that hands back what ``csv.writer`` writes."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(table, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(TABLES[table][1])
+    for row in rows(table, chunk_size):
+        yield writer.writerow(row.values())
+
+
+def stream(data_format, tables, chunk_size=CHUNK_SIZE):
+    """Lines of a dump; CSV holds a single table."""
+    if data_format == 'csv':
+        if len(tables) != 1:
+            raise ValueError('CSV export takes exactly one table')
+        return csv_lines(tables[0], chunk_size)
+    return jsonl(tables, chunk_size)
@@ -1,6 +1,28 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
 
-from .models import Comment, Post
+from . import groups
+from .models import Comment, Group, Post, User
+
+
+class GroupChoiceIterator(ModelChoiceIterator):
+    """Group choices from ``posts.groups`` instead of a query per render."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for group in groups.all_groups():
+            yield self.choice(group)
+
+    def __len__(self):
+        return (len(groups.all_groups())
+                + (self.field.empty_label is not None))
+
+
+def use_group_registry(field):
+    field.iterator = GroupChoiceIterator
+    # The widget took its choices when the field was made.
+    field.widget.choices = field.choices
 
 
 class PostForm(forms.ModelForm):
@@ -16,6 +38,10 @@ class PostForm(forms.ModelForm):
             'image': 'Изображение'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        use_group_registry(self.fields['group'])
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -27,3 +53,28 @@ class CommentForm(forms.ModelForm):
         labels = {
             'text': 'Текст'
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+        empty_label='Все группы'
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        use_group_registry(self.fields['group'])
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Такого автора нет')
+        return author
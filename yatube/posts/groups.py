@@ -0,0 +1,98 @@
+"""In-process directory of the groups.
+
+Groups are few and change rarely, yet every group page, every post card
+and every post form needs them. The registry reads them all with one
+query and keeps them in the process until a group is saved or deleted:
+the signals bump the ``GROUPS`` cache version, and every worker sharing
+that cache reloads when it sees a version other than the one it loaded.
+A worker that cannot see the bump, with a cache of its own, reloads
+after ``GROUPS_REGISTRY_TIMEOUT``, or at once when asked for a group it
+does not know that the database has.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from yatube.replicas import primary_reads
+
+from . import caching
+from .models import Group
+
+GROUPS = 'groups'
+
+_Snapshot = namedtuple('_Snapshot', 'version loaded groups by_id by_slug')
+_empty = _Snapshot(None, 0, (), {}, {})
+_snapshot = _empty
+_lock = threading.Lock()
+
+
+def _fresh(snapshot, version):
+    # Without a cache there is no version to trust; read every time.
+    return (version is not None and snapshot.version == version
+            and time.monotonic() - snapshot.loaded
+            < settings.GROUPS_REGISTRY_TIMEOUT)
+
+
+def _current(reload=False):
+    global _snapshot
+    version = caching.get_version(GROUPS)
+    snapshot = _snapshot
+    if not reload and _fresh(snapshot, version):
+        return snapshot
+    with _lock:
+        if not reload and _fresh(_snapshot, version):
+            return _snapshot
+        with primary_reads():
+            groups = tuple(Group.objects.order_by('pk'))
+        snapshot = _Snapshot(
+            version, time.monotonic(), groups,
+            {group.pk: group for group in groups},
+            {group.slug: group for group in groups},
+        )
+        _snapshot = snapshot
+    return snapshot
+
+
+def _lookup(index, **lookup):
+    (key,) = lookup.values()
+    group = getattr(_current(), index).get(key)
+    if group is None and Group.objects.filter(**lookup).exists():
+        # Made by a worker whose bump this process has not seen.
+        group = getattr(_current(reload=True), index).get(key)
+    return group
+
+
+def all_groups():
+    """Every group, oldest first."""
+    return _current().groups
+
+
+def by_id(pk):
+    return _lookup('by_id', pk=pk)
+
+
+def by_slug(slug):
+    return _lookup('by_slug', slug=slug)
+
+
+def attach(posts):
+    """Set ``post.group`` of ``posts`` from the registry.
+
+    A group the registry does not know yet is left to be loaded lazily.
+    """
+    posts = [post for post in posts if post.group_id is not None]
+    if not posts:
+        return
+    known = _current().by_id
+    for post in posts:
+        group = known.get(post.group_id)
+        if group is not None:
+            post.group = group
+
+
+def forget():
+    """Drop the groups loaded by this process after a group changed."""
+    global _snapshot
+    _snapshot = _empty
+    caching.bump_version(GROUPS)
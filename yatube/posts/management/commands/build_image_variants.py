@@ -0,0 +1,69 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts import caching, variants
+from posts.models import Post
+
+
+def build(name):
+    # Runs in a worker process, which never touches the database.
+    try:
+        return name, variants.build(name), None
+    except Exception as error:
+        return name, None, error
+
+
+class Command(BaseCommand):
+    help = 'Создаёт адаптивные варианты изображений записей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать варианты и у записей, где они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            posts = posts.filter(image_variants='')
+        names = {}
+        # Variants written by earlier runs; with --all they are replaced.
+        previous = {}
+        for pk, name, stored in posts.values_list(
+                'pk', 'image', 'image_variants').iterator():
+            names.setdefault(name, []).append(pk)
+            previous.setdefault(name, set()).update(
+                variants.paths(json.loads(stored or '{}'))
+            )
+        built = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('fork')
+        ) as pool:
+            for name, result, error in pool.map(build, names, chunksize=8):
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                built += Post.objects.filter(
+                    pk__in=names[name], image=name
+                ).update(
+                    image_variants=json.dumps(result),
+                    version=F('version') + 1
+                )
+                for path in previous[name] - variants.paths(result):
+                    default_storage.delete(path)
+        caching.bump_version(caching.INDEX_PAGE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано записей: {built}, ошибок: {failed}'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, записи, комментарии и подписки в JSONL '
+        'или одну таблицу в CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--table', action='append', choices=export.TABLES,
+            help='Таблица для выгрузки, можно несколько; по умолчанию все.'
+        )
+        parser.add_argument('--output', help='Файл; по умолчанию stdout.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        tables = options['table'] or list(export.TABLES)
+        try:
+            lines = export.stream(
+                options['format'], tables, options['chunk_size']
+            )
+        except ValueError:
+            raise CommandError('Для CSV укажите одну таблицу в --table')
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            output.writelines(lines)
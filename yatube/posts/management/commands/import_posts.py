@@ -0,0 +1,347 @@
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import caching, thumbnails
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+
+CSV_FIELDS = ('author', 'group', 'text', 'pub_date', 'image')
+REQUIRED = ('author', 'text')
+
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            yield number, None
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: {error}')
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    missing = set(REQUIRED) - set(reader.fieldnames or ())
+    if missing:
+        raise CommandError(f'В CSV нет столбцов: {", ".join(missing)}')
+    for row in reader:
+        yield reader.line_num, row
+
+
+def parse_date(value):
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def fetch_image(source, timeout=30):
+    """Store an image given by URL or local path, return its name."""
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=timeout) as response:
+            content = response.read()
+    else:
+        with open(source, 'rb') as file:
+            content = file.read()
+    name = os.path.basename(source.split('?')[0]) or 'image'
+    return default_storage.save(f'posts/{name}', ContentFile(content))
+
+
+def generate_thumbnails(post):
+    try:
+        thumbnails.generate(post.pk, post.image.name)
+    finally:
+        connection.close()
+
+
+def allocate_ids(model, count):
+    """Reserve ``count`` primary keys past the largest one in use.
+
+    Only for databases that do not return keys from ``bulk_create``
+    (SQLite). Called inside the import transaction: if another writer
+    commits in between, SQLite refuses our write instead of letting the
+    keys collide.
+    """
+    start = (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+    return range(start, start + count)
+
+
+class Names:
+    """Username and slug to id maps, filled a chunk at a time."""
+
+    def __init__(self, create):
+        self.create = create
+        self.authors = {}
+        self.groups = {}
+
+    def resolve(self, records):
+        usernames = {record['author'] for record in records}
+        for comment in itertools.chain.from_iterable(
+                record['comments'] for record in records):
+            usernames.add(comment['author'])
+        created = self.load(self.authors, User, 'username', usernames,
+                            lambda name: {'password': make_password(None)})
+        # bulk_create skips the signal that gives a new user its counters.
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=self.authors[name]) for name in created],
+            ignore_conflicts=True
+        )
+        slugs = {record['group'] for record in records if record['group']}
+        self.load(self.groups, Group, 'slug', slugs,
+                  lambda slug: {'title': slug})
+
+    def load(self, known, model, field, names, defaults):
+        """Add the ids of ``names`` to ``known``; return the names created."""
+        missing = names - known.keys()
+        if not missing:
+            return set()
+        known.update(model.objects.filter(
+            **{f'{field}__in': missing}
+        ).values_list(field, 'id'))
+        missing -= known.keys()
+        if not missing or not self.create:
+            return set()
+        model.objects.bulk_create(
+            [model(**{field: name}, **defaults(name)) for name in missing],
+            ignore_conflicts=True
+        )
+        known.update(model.objects.filter(
+            **{f'{field}__in': missing}
+        ).values_list(field, 'id'))
+        return missing & known.keys()
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует записи из JSONL или CSV (файл или "-" для stdin). '
+        'Строка JSONL: {"author", "text", "group", "pub_date", "image", '
+        '"comments": [{"author", "text", "created"}]}; столбцы CSV: '
+        + ', '.join(CSV_FIELDS) + ' (без комментариев).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default='-')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='По умолчанию по расширению файла, для stdin — jsonl.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--image-workers', type=int, default=8)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом обработанных строк для продолжения импорта.'
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы.'
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        data_format = options['format'] or (
+            'csv' if source.lower().endswith('.csv') else 'jsonl'
+        )
+        checkpoint = options['checkpoint']
+        done = 0
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                done = int(file.read() or 0)
+        self.names = Names(options['create_missing'])
+        self.stats = {'rows': 0, 'posts': 0, 'comments': 0, 'skipped': 0}
+        self.authors = set()
+        started = time.perf_counter()
+        stream = (
+            io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+            if source == '-' else open(source, encoding='utf-8', newline='')
+        )
+        read = read_csv if data_format == 'csv' else read_jsonl
+        rows = itertools.islice(read(stream), done, None)
+        with stream, ThreadPoolExecutor(options['image_workers']) as pool:
+            while True:
+                chunk = list(itertools.islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, pool)
+                done += len(chunk)
+                self.stats['rows'] += len(chunk)
+                if checkpoint:
+                    with open(checkpoint + '.tmp', 'w') as file:
+                        file.write(str(done))
+                    os.replace(checkpoint + '.tmp', checkpoint)
+                if options['verbosity'] > 1:
+                    self.report(started, done)
+        for author_id in self.authors:
+            UserStats.objects.rebuild(author_id)
+        caching.bump_version(caching.INDEX_PAGE)
+        self.report(started, done, self.style.SUCCESS)
+
+    def report(self, started, done, style=str):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(style(
+            f'Строк: {done}, записей: {self.stats["posts"]}, '
+            f'комментариев: {self.stats["comments"]}, '
+            f'пропущено: {self.stats["skipped"]}, '
+            f'{self.stats["rows"] / max(elapsed, 1e-9):.0f} строк/с'
+        ))
+
+    def clean(self, number, raw):
+        if raw is None:
+            return None
+        if isinstance(raw, dict) and raw.get('type', 'post') != 'post':
+            # Groups, comments and follows of a dump made by ``export``.
+            self.stats['skipped'] += 1
+            return None
+        try:
+            record = {
+                'line': number,
+                'author': raw['author'],
+                'text': raw['text'],
+                'group': raw.get('group') or None,
+                'pub_date': parse_date(raw.get('pub_date')),
+                'image': raw.get('image') or None,
+                'comments': [
+                    {'author': comment['author'], 'text': comment['text'],
+                     'created': parse_date(comment.get('created'))}
+                    for comment in raw.get('comments') or ()
+                ],
+            }
+        except (KeyError, TypeError, ValueError) as error:
+            return self.skip(number, f'неверная запись ({error})')
+        if not record['author'] or not record['text']:
+            return self.skip(number, 'нет автора или текста')
+        return record
+
+    def skip(self, number, reason):
+        self.stats['skipped'] += 1
+        self.stderr.write(f'Строка {number}: {reason}, пропущена')
+        return None
+
+    def attach_image(self, record):
+        try:
+            record['image'] = fetch_image(record['image'])
+        except (OSError, ValueError) as error:
+            self.stderr.write(f'{record["image"]}: {error}')
+            record['image'] = None
+        return record
+
+    def import_chunk(self, chunk, pool):
+        records = [
+            record for record in itertools.starmap(self.clean, chunk)
+            if record is not None
+        ]
+        self.names.resolve(records)
+        authors, groups = self.names.authors, self.names.groups
+        valid = []
+        for record in records:
+            if record['author'] not in authors:
+                self.skip(record['line'], f'нет автора {record["author"]}')
+            elif record['group'] and record['group'] not in groups:
+                self.skip(record['line'], f'нет группы {record["group"]}')
+            else:
+                record['comments'] = [
+                    comment for comment in record['comments']
+                    if comment['author'] in authors
+                ]
+                valid.append(record)
+        list(pool.map(
+            self.attach_image, [record for record in valid if record['image']]
+        ))
+
+        posts = [
+            Post(
+                author_id=authors[record['author']],
+                group_id=groups.get(record['group']),
+                text=record['text'],
+                image=record['image'],
+                comments_count=len(record['comments']),
+            )
+            for record in valid
+        ]
+        comments, created = [], []
+        with transaction.atomic():
+            self.create(Post, posts)
+            for post, record in zip(posts, valid):
+                for comment in record['comments']:
+                    comments.append(Comment(
+                        post=post,
+                        author_id=authors[comment['author']],
+                        text=comment['text'],
+                    ))
+                    created.append(comment['created'])
+            self.create(Comment, comments)
+            # auto_now_add overwrote the dates during bulk_create.
+            self.restore(posts, [record['pub_date'] for record in valid],
+                         'pub_date')
+            self.restore(comments, created, 'created')
+            self.push_timelines(posts)
+        self.authors.update(post.author_id for post in posts)
+        self.stats['posts'] += len(posts)
+        self.stats['comments'] += len(comments)
+        self.make_thumbnails(
+            [post for post in posts if post.image], pool
+        )
+
+    def restore(self, objects, dates, field):
+        changed = []
+        for obj, date in zip(objects, dates):
+            if date is not None:
+                setattr(obj, field, date)
+                changed.append(obj)
+        if changed:
+            type(changed[0]).objects.bulk_update(
+                changed, [field], batch_size=500
+            )
+
+    def make_thumbnails(self, posts, pool):
+        if not settings.THUMBNAIL_ASYNC:
+            for post in posts:
+                thumbnails.generate(post.pk, post.image.name)
+            return
+        # Made here rather than queued, so that a long import does not
+        # pile up a backlog of every image in memory.
+        list(pool.map(generate_thumbnails, posts))
+
+    def create(self, model, objects):
+        """``bulk_create`` that leaves primary keys set on ``objects``."""
+        if not connection.features.can_return_rows_from_bulk_insert:
+            for obj, pk in zip(objects, allocate_ids(model, len(objects))):
+                obj.pk = pk
+        model.objects.bulk_create(objects, batch_size=500)
+
+    def push_timelines(self, posts):
+        """What ``post_save`` would have done: fill followers' timelines."""
+        followers = {}
+        for author_id, user_id in Follow.objects.filter(
+            author_id__in={post.author_id for post in posts}
+        ).exclude(author__stats__fan_out=False).values_list(
+            'author_id', 'user_id'
+        ):
+            followers.setdefault(author_id, []).append(user_id)
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+             for post in posts
+             for user_id in followers.get(post.author_id, ())),
+            batch_size=500
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Post, UserStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики комментариев, записей и подписок.'
+
+    def handle(self, *args, **options):
+        comments = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post').annotate(total=Count('id')).values('total')
+        with transaction.atomic():
+            posts = Post.objects.update(
+                comments_count=Coalesce(Subquery(comments), 0)
+            )
+            UserStats.objects.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано записей: {posts}, '
+            f'пользователей: {UserStats.objects.count()}'
+        ))
@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик.'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: YATUBE_REPLICA_PATHS')
+        for alias in ['default', *settings.DATABASE_REPLICAS]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: поддерживается только SQLite')
+        primary = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                replica = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    # The backup API copies a consistent snapshot while
+                    # the primary keeps taking writes.
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+                self.stdout.write(self.style.SUCCESS(f'{alias}: готово'))
+        finally:
+            primary.close()
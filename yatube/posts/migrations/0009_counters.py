@@ -0,0 +1,57 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    for post_id, total in Post.objects.values_list('id').annotate(
+            Count('comments')).order_by():
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+    counters = {}
+    for field, queryset in (
+        ('posts_count', Post.objects.values_list('author')),
+        ('followers_count', Follow.objects.values_list('author')),
+        ('following_count', Follow.objects.values_list('user')),
+    ):
+        for user_id, total in queryset.annotate(Count('id')).order_by():
+            counters.setdefault(user_id, {})[field] = total
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id, **fields)
+         for user_id, fields in counters.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_auto_20210630_0859'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_list'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:40
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    UserStats = apps.get_model('posts', 'UserStats')
+    fanout_limit = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+    backfill_limit = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 200)
+    # Popular authors are pulled at read time, as in timeline.backfill.
+    pulled = Follow.objects.values('author').annotate(
+        followers=models.Count('id')
+    ).filter(followers__gt=fanout_limit).values('author')
+    UserStats.objects.filter(user__in=pulled).update(fan_out=False)
+    followers = defaultdict(list)
+    for user_id, author_id in Follow.objects.exclude(
+            author__in=pulled).values_list('user', 'author').iterator():
+        followers[author_id].append(user_id)
+    for author_id, user_ids in followers.items():
+        posts = list(Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:backfill_limit])
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=date)
+             for user_id in user_ids for post_id, date in posts),
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fan_out',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_user_pub_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
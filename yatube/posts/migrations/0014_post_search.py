@@ -0,0 +1,87 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:40
+
+from django.db import migrations
+
+# The schema as of this migration; posts.search may move on from it.
+SELECT_ROW = '''
+    SELECT new.id, new.text, g.title, g.description
+    FROM (SELECT 1) LEFT JOIN posts_group g ON g.id = new.group_id;
+'''
+
+SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_search USING fts5(
+        text, group_title, group_description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_search (
+            rowid, text, group_title, group_description
+        )
+    ''' + SELECT_ROW + 'END',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_update
+    AFTER UPDATE OF text, group_id ON posts_post BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+        INSERT INTO posts_post_search (
+            rowid, text, group_title, group_description
+        )
+    ''' + SELECT_ROW + 'END',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_delete
+    AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_group_search_update
+    AFTER UPDATE OF title, description ON posts_group BEGIN
+        UPDATE posts_post_search
+        SET group_title = new.title, group_description = new.description
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    ''',
+]
+
+REINDEX = '''
+    INSERT INTO posts_post_search (
+        rowid, text, group_title, group_description
+    )
+    SELECT p.id, p.text, g.title, g.description
+    FROM posts_post p LEFT JOIN posts_group g ON g.id = p.group_id
+'''
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_group_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE IF EXISTS posts_post_search',
+]
+
+
+def create_index(apps, schema_editor):
+    # Search is built on SQLite's FTS5; other databases go without it.
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SCHEMA + [REINDEX]:
+            schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
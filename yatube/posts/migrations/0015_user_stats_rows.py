@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:05
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def add_missing_rows(apps, schema_editor):
+    # UserStats.objects.bump no longer creates rows; every user needs one.
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    counters = {
+        user_id: {}
+        for user_id in User.objects.exclude(
+            pk__in=UserStats.objects.values('user_id')
+        ).values_list('pk', flat=True)
+    }
+    for field, column, model in (
+        ('posts_count', 'author', Post),
+        ('followers_count', 'author', Follow),
+        ('following_count', 'user', Follow),
+    ):
+        for user_id, total in model.objects.filter(
+                **{f'{column}__in': list(counters)}
+        ).values_list(column).annotate(Count('id')).order_by():
+            counters[user_id][field] = total
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id, **fields)
+         for user_id, fields in counters.items()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_missing_rows, migrations.RunPython.noop),
+    ]
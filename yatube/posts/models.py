@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, F
 
 User = get_user_model()
 
@@ -13,13 +14,32 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Posts with just the columns a post card renders.
+
+        The author comes from the same query, the group from
+        ``posts.groups``, and the comment count is the stored
+        ``comments_count``, so a feed page costs the same number of
+        queries however many cards it shows.
+        """
+        return self.select_related('author').only(
+            'id', 'text', 'pub_date', 'image', 'image_variants',
+            'comments_count', 'version', 'group',
+            'author__id', 'author__username',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст')
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    # The composite indexes in Meta start with author and group, so the
+    # foreign keys do not need their own.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -27,12 +47,31 @@ class Post(models.Model):
         blank=True,
         on_delete=models.SET_NULL,
         related_name='posts',
-        null=True
+        null=True,
+        db_index=False
     )
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # JSON written by posts.variants.build: {format: [[width, name], ...]}.
+    image_variants = models.TextField(blank=True, default='', editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped whenever the rendered post card would change.
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Each feed filters on a leading column, if any, and walks
+        # (pub_date, id) newest first; see CursorPaginator.
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='post_pub_date'),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_pub_date'),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -43,7 +82,8 @@ class Comment(models.Model):
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
-        null=True
+        null=True,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -54,18 +94,25 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created')
+        ]
 
 
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='follower'
+        related_name='follower',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
@@ -74,3 +121,99 @@ class Follow(models.Model):
                 fields=('user', 'author'),
                 name='unique_list')
         ]
+        # unique_list answers "whom does a user follow"; this one answers
+        # "who follows an author" for fan-out and the follower counters.
+        indexes = [
+            models.Index(fields=['author', 'user'], name='follow_author')
+        ]
+
+
+class UserStatsManager(models.Manager):
+    def bump(self, user_id, **deltas):
+        """Shift the stored counters of ``user_id`` by ``deltas``.
+
+        Every user gets a row when created (``signals.user_created``);
+        users made with ``bulk_create`` need ``rebuild`` or
+        ``rebuild_all``.
+        """
+        self.filter(user_id=user_id).update(
+            **{name: F(name) + delta for name, delta in deltas.items()}
+        )
+
+    def rebuild(self, user_id):
+        self.update_or_create(user_id=user_id, defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        })
+
+    def rebuild_all(self):
+        counters = {
+            user_id: {}
+            for user_id in User.objects.values_list('id', flat=True)
+        }
+        for field, queryset in (
+            ('posts_count', Post.objects.values_list('author')),
+            ('followers_count', Follow.objects.values_list('author')),
+            ('following_count', Follow.objects.values_list('user')),
+        ):
+            for user_id, count in queryset.annotate(Count('id')).order_by():
+                counters.setdefault(user_id, {})[field] = count
+        for user_id in self.filter(fan_out=False).values_list(
+                'user', flat=True):
+            counters.setdefault(user_id, {})['fan_out'] = False
+        self.all().delete()
+        self.bulk_create(
+            [self.model(user_id=user_id, **fields)
+             for user_id, fields in counters.items()],
+            batch_size=500
+        )
+
+
+class UserStats(models.Model):
+    """Denormalized per-user counters shown on the author card."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        primary_key=True
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Whether new posts are pushed to the followers' timelines; switched
+    # off for good once the author outgrows TIMELINE_FANOUT_LIMIT.
+    fan_out = models.BooleanField(default=True)
+
+    objects = UserStatsManager()
+
+
+class TimelineEntry(models.Model):
+    """A post of a followed author, materialized for the follow feed."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date')
+        ]
@@ -0,0 +1,152 @@
+"""Keyset (cursor) pagination for the post feeds.
+
+``Paginator`` pages with ``COUNT(*)`` plus ``OFFSET``, and both get slower
+as the table grows. ``CursorPaginator`` remembers the ordering key of the
+first and last row on a page and asks for the rows right after (or right
+before) it, so every page costs one range query whatever its depth.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+def encode_cursor(values):
+    """Pack ordering key values into an opaque url-safe token."""
+    raw = json.dumps(
+        [value.isoformat() if hasattr(value, 'isoformat') else value
+         for value in values],
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a token made by ``encode_cursor``, ``None`` if it is broken."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode())
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class CursorPaginator(Paginator):
+    """Paginate a queryset newest first by ``keys`` without counting it.
+
+    The last key must be unique so that rows sharing the leading values
+    still have a strict order. ``cursor_page()`` returns a plain ``Page``
+    without a number; its ``next_cursor`` and ``previous_cursor`` tokens
+    are ``None`` at the ends of the feed. ``page()`` keeps working for
+    callers that really need numbered pages.
+    """
+
+    keys = ('pub_date', 'id')
+
+    def __init__(self, object_list, per_page=PER_PAGE, keys=None):
+        if keys is not None:
+            self.keys = tuple(keys)
+        super().__init__(self.order(object_list), per_page)
+
+    def order(self, object_list):
+        """``object_list`` sorted newest first by ``keys``."""
+        if hasattr(object_list, 'order_by'):
+            object_list = object_list.order_by(
+                *['-' + key for key in self.keys]
+            )
+        return object_list
+
+    def position(self, obj):
+        return [getattr(obj, key) for key in self.keys]
+
+    def parse_cursor(self, token):
+        values = decode_cursor(token) if token else None
+        if values is None or len(values) != len(self.keys):
+            return None
+        opts = self.object_list.model._meta
+        try:
+            return [
+                opts.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except ValidationError:
+            return None
+
+    def seek(self, position, forward, keys=None):
+        """Condition selecting rows after (or before) ``position``.
+
+        ``keys`` names the columns to compare when they are spelled
+        differently from ``self.keys`` in the query at hand.
+        """
+        condition = Q()
+        if position is None:
+            return condition
+        keys = keys or self.keys
+        lookup = 'lt' if forward else 'gt'
+        for index, key in enumerate(keys):
+            exact = dict(zip(keys[:index], position))
+            exact[f'{key}__{lookup}'] = position[index]
+            condition |= Q(**exact)
+        return condition
+
+    def fetch(self, position, forward, limit):
+        """Return up to ``limit`` rows in walking order from ``position``."""
+        queryset = self.object_list.filter(self.seek(position, forward))
+        if not forward:
+            queryset = queryset.reverse()
+        return list(queryset[:limit])
+
+    def make_page(self, rows, has_next, has_previous):
+        page = Page(rows, None, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = encode_cursor(self.position(rows[-1]))
+        if rows and has_previous:
+            page.previous_cursor = encode_cursor(self.position(rows[0]))
+        return page
+
+    def cursor_page(self, after=None, before=None):
+        position = self.parse_cursor(before)
+        if position is not None:
+            rows = self.fetch(position, False, self.per_page + 1)
+            if rows:
+                return self.make_page(
+                    rows[:self.per_page][::-1],
+                    has_next=True,
+                    has_previous=len(rows) > self.per_page
+                )
+        position = self.parse_cursor(after)
+        rows = self.fetch(position, True, self.per_page + 1)
+        return self.make_page(
+            rows[:self.per_page],
+            has_next=len(rows) > self.per_page,
+            has_previous=position is not None
+        )
+
+
+def page_state(page):
+    """The rows and cursors of a cursor page, without its paginator."""
+    return list(page.object_list), page.next_cursor, page.previous_cursor
+
+
+def restore_page(state):
+    """A cursor page back from ``page_state``."""
+    rows, next_cursor, previous_cursor = state
+    page = Page(rows, None, None)
+    page.next_cursor, page.previous_cursor = next_cursor, previous_cursor
+    return page
+
+
+def paginate(request, object_list, per_page=PER_PAGE,
+             paginator_class=CursorPaginator, **kwargs):
+    """Return the page of ``object_list`` for ``?after=``/``?before=``."""
+    paginator = paginator_class(object_list, per_page, **kwargs)
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
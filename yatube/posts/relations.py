@@ -0,0 +1,47 @@
+"""Which authors the viewer follows, loaded once per request.
+
+The ids of every author a user follows come from one query by
+``user_id`` and are kept in the cache for ``FOLLOWING_CACHE_TIMEOUT``
+seconds and on the request itself, so a page can ask about any number
+of authors (author card, every post card) without another query.
+Following or unfollowing someone drops the cached set.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+REQUEST_ATTRIBUTE = '_followed_author_ids'
+
+
+def _key(user_id):
+    return f'following:{user_id}'
+
+
+def followed_ids(request):
+    """Frozen set of the ids of the authors ``request.user`` follows."""
+    if request is None or not request.user.is_authenticated:
+        return frozenset()
+    ids = getattr(request, REQUEST_ATTRIBUTE, None)
+    if ids is None:
+        key = _key(request.user.pk)
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(Follow.objects.filter(
+                user_id=request.user.pk
+            ).values_list('author_id', flat=True))
+            cache.set(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+        setattr(request, REQUEST_ATTRIBUTE, ids)
+    return ids
+
+
+def is_following(request, author_id):
+    return author_id in followed_ids(request)
+
+
+def forget(user_id):
+    """Drop the cached set of ``user_id`` after a follow or unfollow."""
+    cache.delete(_key(user_id))
+    # A request may cache the old set again before the change commits.
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
@@ -0,0 +1,195 @@
+"""Full-text search over posts with SQLite FTS5.
+
+``posts_post_search`` holds the text of every post together with the
+title and description of its group; its rowid is the post id. Triggers
+on ``posts_post`` and ``posts_group`` keep it in step with every write,
+including ``update()`` and raw SQL. SQLite drops the triggers of a table
+that a migration rebuilds, so ``install`` runs again after every
+``migrate`` (see ``signals.py``).
+
+Hits are ranked by ``bm25`` and paginated by (score, id) like the feeds.
+"""
+import re
+
+from django.db import connection, connections, router
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import groups
+from .models import Post
+from .paginator import CursorPaginator, decode_cursor
+
+# Creates the index; ``install`` only repairs it once this is applied.
+MIGRATION = '0014_post_search'
+
+SELECT_ROW = '''
+    SELECT new.id, new.text, g.title, g.description
+    FROM (SELECT 1) LEFT JOIN posts_group g ON g.id = new.group_id;
+'''
+
+SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_search USING fts5(
+        text, group_title, group_description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_search (
+            rowid, text, group_title, group_description
+        )
+    ''' + SELECT_ROW + 'END',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_update
+    AFTER UPDATE OF text, group_id ON posts_post BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+        INSERT INTO posts_post_search (
+            rowid, text, group_title, group_description
+        )
+    ''' + SELECT_ROW + 'END',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_post_search_delete
+    AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS posts_group_search_update
+    AFTER UPDATE OF title, description ON posts_group BEGIN
+        UPDATE posts_post_search
+        SET group_title = new.title, group_description = new.description
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    ''',
+]
+
+# Matches in the text column weigh most, the group description least.
+WEIGHTS = (10.0, 4.0, 1.0)
+SNIPPET_TOKENS = 40
+# Control characters cannot come from a form, so they mark the matches
+# safely until the snippet is escaped.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Create the index and its triggers if they are missing."""
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def reindex(using=connection):
+    """Fill the index from scratch."""
+    with using.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_post_search')
+        cursor.execute('''
+            INSERT INTO posts_post_search (
+                rowid, text, group_title, group_description
+            )
+            SELECT p.id, p.text, g.title, g.description
+            FROM posts_post p LEFT JOIN posts_group g ON g.id = p.group_id
+        ''')
+
+
+def match_expression(query):
+    """Turn what a user typed into an FTS5 query matching all the words.
+
+    Each word is quoted, so operators and punctuation are searched as
+    plain text instead of failing as FTS5 syntax.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Cursor pages of the posts matching ``query``, best match first.
+
+    ``group`` and ``author`` narrow the search to one group or author.
+    Posts on a page carry ``search_score`` and ``search_snippet``.
+    """
+
+    keys = ('search_score', 'id')
+
+    def __init__(self, object_list, per_page, query, group=None,
+                 author=None):
+        self.match = match_expression(query)
+        self.filters = {'group_id': group, 'author_id': author}
+        super().__init__(object_list, per_page)
+
+    def order(self, object_list):
+        # The rows come ranked from the full-text index, see ``fetch``.
+        return object_list
+
+    def parse_cursor(self, token):
+        values = decode_cursor(token) if token else None
+        if (values is None or len(values) != 2
+                or not all(isinstance(value, (int, float))
+                           for value in values)):
+            return None
+        return [float(values[0]), int(values[1])]
+
+    def fetch(self, position, forward, limit):
+        # Hits and their posts come from the same database; the router
+        # may send this to a replica, which has the index too.
+        alias = router.db_for_read(Post)
+        using = connections[alias]
+        if not self.match or not available(using):
+            return []
+        where, params = ['posts_post_search MATCH %s'], [self.match]
+        for column, value in self.filters.items():
+            if value is not None:
+                where.append(f'p.{column} = %s')
+                params.append(value)
+        seek, seek_params = '', []
+        if position is not None:
+            op = '<' if forward else '>'
+            seek = f'WHERE score {op} %s OR (score = %s AND id {op} %s)'
+            seek_params = [position[0], position[0], position[1]]
+        order = 'DESC' if forward else 'ASC'
+        with using.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT id, score, snippet FROM (
+                    SELECT p.id AS id,
+                        -bm25(posts_post_search, %s, %s, %s) AS score,
+                        snippet(posts_post_search, 0, %s, %s, '…', %s)
+                        AS snippet
+                    FROM posts_post_search
+                    JOIN posts_post p ON p.id = posts_post_search.rowid
+                    WHERE {' AND '.join(where)}
+                )
+                {seek}
+                ORDER BY score {order}, id {order}
+                LIMIT %s
+            ''', [
+                *WEIGHTS, MARK_START, MARK_END, SNIPPET_TOKENS,
+                *params, *seek_params, limit,
+            ])
+            hits = cursor.fetchall()
+        posts = Post.objects.for_feed().using(alias).in_bulk(
+            [pk for pk, *_ in hits]
+        )
+        rows = []
+        for pk, score, snippet in hits:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_score = score
+                post.search_snippet = highlight(snippet)
+                rows.append(post)
+        groups.attach(rows)
+        return rows
@@ -0,0 +1,128 @@
+from django.db import connections
+from django.db.models import F
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import caching, groups, relations, search, timeline, usernames
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            version=F('version') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') - 1,
+            version=F('version') + 1
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.bump(instance.author_id, posts_count=1)
+        timeline.push_post(instance)
+    else:
+        Post.objects.filter(pk=instance.pk).update(version=F('version') + 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    UserStats.objects.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.bump(instance.user_id, following_count=1)
+        UserStats.objects.bump(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        relations.forget(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    UserStats.objects.bump(instance.user_id, following_count=-1)
+    UserStats.objects.bump(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    relations.forget(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        instance.posts.update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_saved(sender, **kwargs):
+    groups.forget()
+
+
+def _may_rename(update_fields):
+    # A login saves only last_login and keeps the cached id valid.
+    return update_fields is None or 'username' in update_fields
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.create(user_id=instance.pk)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and _may_rename(update_fields):
+        instance._saved_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if not _may_rename(update_fields):
+        return
+    saved = getattr(instance, '_saved_username', None)
+    usernames.forget(instance.username, saved)
+    if saved is not None and saved != instance.username:
+        # Cards and the cached index rows link to the old profile.
+        instance.posts.update(version=F('version') + 1)
+        caching.bump_version(caching.INDEX_PAGE)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    usernames.forget(instance.username)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_index(sender, **kwargs):
+    caching.bump_version(caching.INDEX_PAGE)
+
+
+@receiver(post_migrate)
+def install_search(sender, using, **kwargs):
+    if sender.name != 'posts':
+        return
+    # Not after migrating back past the migration that made the index.
+    applied = MigrationRecorder(connections[using]).applied_migrations()
+    if ('posts', search.MIGRATION) in applied:
+        search.install(connections[using])
@@ -0,0 +1,15 @@
+// «Показать ещё комментарии»: подгружает следующую страницу
+// комментариев и вставляет её на место кнопки.
+$(document).on('click', '.js-more-comments a', function (event) {
+  event.preventDefault();
+  var link = $(this);
+  var more = link.closest('.js-more-comments');
+  link.addClass('disabled');
+  $.get(link.data('url'))
+    .done(function (html) {
+      more.replaceWith(html);
+    })
+    .fail(function () {
+      link.removeClass('disabled');
+    });
+});
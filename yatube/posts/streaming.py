@@ -0,0 +1,67 @@
+"""Pages that start sending before their cards or comments are rendered.
+
+With ``STREAM_PAGES`` on, a page template is rendered with the content
+of its ``{% streamed %}`` block replaced by ``MARKER``. The part before
+the marker (head, navigation, author card) goes out at once, the items
+the block would have listed follow one by one as they are rendered,
+and the rest of the page closes the stream. With the setting off the
+same templates render the block in place.
+
+The stream runs after the view has returned, so it runs in a copy of
+the view's context: its reads go to the database the view read from.
+"""
+import contextvars
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = '<!--streamed-->'
+CONTEXT_NAME = 'streaming_marker'
+
+
+def _in_context(chunks):
+    context = contextvars.copy_context()
+    chunks = iter(chunks)
+    while True:
+        try:
+            yield context.run(next, chunks)
+        except StopIteration:
+            return
+
+
+def render_streamed(request, template_name, context, items, render_item,
+                    prepare=None):
+    """Render the page, streaming ``render_item(item)`` for ``items``.
+
+    ``prepare(items)`` runs before the items are rendered; when the page
+    streams, that is after the head has been sent.
+    """
+    if not settings.STREAM_PAGES:
+        if prepare is not None:
+            prepare(items)
+        return render(request, template_name, context)
+    page = render_to_string(
+        template_name, {**context, CONTEXT_NAME: mark_safe(MARKER)}, request
+    )
+    head, tail = page.split(MARKER, 1)
+
+    def chunks():
+        yield head
+        if prepare is not None:
+            prepare(items)
+        for item in items:
+            yield render_item(item)
+        yield tail
+    return StreamingHttpResponse(_in_context(chunks()))
+
+
+def comment_renderer(request, post):
+    """Render one comment of ``post`` the way ``comment_list.html`` does."""
+    def render_comment(item):
+        return render_to_string('posts/includes/comment_item.html', {
+            'item': item, 'post': post, 'user': request.user,
+        })
+    return render_comment
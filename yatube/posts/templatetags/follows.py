@@ -0,0 +1,10 @@
+from django import template
+
+from .. import relations
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author):
+    return relations.is_following(context.get('request'), author.pk)
@@ -0,0 +1,13 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_query(context, name, cursor):
+    """The current query string pointing at another cursor page."""
+    query = context['request'].GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[name] = cursor
+    return query.urlencode()
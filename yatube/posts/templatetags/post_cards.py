@@ -0,0 +1,23 @@
+from django import template
+
+from .. import thumbnails, variants
+from ..cards import render_card
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return render_card(post, context.get('user'), context.get('request'))
+
+
+@register.simple_tag
+def ready_thumbnail(post, size='card'):
+    if size == 'card' and hasattr(post, 'thumbnail'):
+        return post.thumbnail
+    return thumbnails.lookup(post.image, size)
+
+
+@register.simple_tag
+def picture_sources(post):
+    return variants.sources(post)
@@ -0,0 +1,24 @@
+from django import template
+
+from ..streaming import CONTEXT_NAME
+
+register = template.Library()
+
+
+class StreamedNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        marker = context.get(CONTEXT_NAME)
+        if marker:
+            return marker
+        return self.nodelist.render(context)
+
+
+@register.tag
+def streamed(parser, token):
+    """Items of a page that ``posts.streaming`` may send one by one."""
+    nodelist = parser.parse(('endstreamed',))
+    parser.delete_first_token()
+    return StreamedNode(nodelist)
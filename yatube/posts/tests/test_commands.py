@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', *args, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """Тест импорта записей и комментариев из JSONL....................."""
+        rows = [
+            {'author': 'author', 'group': 'group', 'text': 'Старый пост',
+             'pub_date': '2015-05-01T10:00:00',
+             'comments': [{'author': 'reader', 'text': 'Ответ',
+                           'created': '2015-05-02T10:00:00+00:00'}]},
+            {'author': 'nobody', 'text': 'Чужой пост'},
+        ]
+        path = self.write(
+            'posts.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n\n'
+        )
+        out, err = self.run_import(path, chunk_size=1)
+        self.assertIn('записей: 1', out)
+        self.assertIn('нет автора nobody', err)
+
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            post.pub_date, datetime(2015, 5, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.comments_count, 1)
+        comment = Comment.objects.get(post=post)
+        self.assertEqual(comment.author, self.reader)
+        self.assertEqual(comment.created.year, 2015)
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.get(user=self.reader).pub_date,
+            post.pub_date
+        )
+
+    def test_import_csv_resumes_from_checkpoint(self):
+        """Тест импорта CSV с продолжением с контрольной точки.............."""
+        path = self.write(
+            'posts.csv', 'author,group,text\nnew,new-group,Первый\n'
+        )
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        self.run_import(path, checkpoint=checkpoint, create_missing=True)
+        post = Post.objects.get(text='Первый')
+        self.assertEqual(post.author.username, 'new')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'new-group')
+
+        self.write('posts.csv', 'new,,Второй\n')
+        self.run_import(path, checkpoint=checkpoint)
+        self.assertEqual(
+            list(Post.objects.filter(author=post.author).values_list(
+                'text', flat=True
+            ).order_by('id')),
+            ['Первый', 'Второй']
+        )
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Текст, с запятой'
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_export_posts_imported_back(self):
+        """Тест что импорт выгрузки берёт только записи...................."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'dump.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            call_command('export', stdout=file)
+        out = StringIO()
+        call_command('import_posts', path, stdout=out, stderr=StringIO())
+        self.assertIn('записей: 1', out.getvalue())
+        self.assertIn('пропущено: 3', out.getvalue())
+        self.assertEqual(
+            Post.objects.filter(text=self.post.text, author=self.author,
+                                group=self.group).count(), 2
+        )
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Group.objects.count(), 1)
+
+    def test_export_command(self):
+        """Тест выгрузки всех таблиц в JSONL и одной в CSV.................."""
+        out = StringIO()
+        call_command('export', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [row['type'] for row in rows],
+            ['group', 'post', 'comment', 'follow']
+        )
+        self.assertEqual(rows[1]['author'], 'author')
+        self.assertEqual(rows[1]['group'], 'group')
+        self.assertEqual(rows[1]['pub_date'], self.post.pub_date.isoformat())
+        self.assertEqual(rows[2]['post'], self.post.pk)
+        self.assertEqual(rows[3], {
+            'type': 'follow', 'user': 'reader', 'author': 'author'
+        })
+
+        out = StringIO()
+        call_command('export', format='csv', table=['posts'], stdout=out)
+        header, line = out.getvalue().splitlines()
+        self.assertEqual(header, 'id,author,group,text,pub_date,image')
+        self.assertIn('"Текст, с запятой"', line)
+
+    def test_export_view_is_streamed_to_staff_only(self):
+        """Тест потоковой выгрузки только для администраторов..............."""
+        url = reverse('export')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+
+        User.objects.filter(pk=self.reader.pk).update(is_staff=True)
+        response = self.client.get(url, {'table': 'follows'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            {'type': 'follow', 'user': 'reader', 'author': 'author'}
+        )
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 
 class Test(TestCase):
@@ -28,3 +31,57 @@ class Test(TestCase):
         """Тест метода str у Post возращающего str[:15]....................."""
         text = Test.post.text[:15]
         self.assertEqual(text, str(self.post))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='kekoslav')
+        cls.reader = User.objects.create(username='kekw')
+        cls.post = Post.objects.create(text='Test', author=cls.author)
+
+    def test_counters_follow_changes(self):
+        """Тест обновления счётчиков при создании и удалении................"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Test'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        stats.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_new_user_has_counters(self):
+        """Тест что счётчики заводятся вместе с пользователем..............."""
+        user = User.objects.create(username='newcomer')
+        Follow.objects.create(user=user, author=self.author)
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (0, 0, 1)
+        )
+
+    def test_rebuild_counters_command(self):
+        """Тест пересчёта счётчиков командой rebuild_counters..............."""
+        Comment.objects.create(post=self.post, author=self.reader, text='1')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.update(comments_count=42)
+        UserStats.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (1, 1, 0)
+        )
@@ -0,0 +1,81 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+# A table read row by row, not through an index. SQLite 3.36 dropped
+# the word TABLE from the plan.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(posts_\w+)$')
+# Tables read whole on purpose: posts.groups loads every group at once.
+WHOLE_TABLES = {'posts_group'}
+# Rows sorted after reading, wholly or past the leading ORDER BY terms.
+SORT = re.compile(r'^USE TEMP B-TREE FOR .*ORDER BY$')
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.heavy = User.objects.create(username='heavy')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        for author in (cls.author, cls.heavy):
+            for i in range(12):
+                cls.post = Post.objects.create(
+                    text=f'Post {i}', author=author, group=cls.group
+                )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='1')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.heavy)
+        UserStats.objects.filter(user=cls.heavy).update(fan_out=False)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url):
+        """``EXPLAIN QUERY PLAN`` of every query the first two pages run."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            page = response.context.get('page') if response.context else None
+            cursor = getattr(page, 'next_cursor', None)
+            if cursor:
+                self.client.get(f'{url}?after={cursor}')
+        with connection.cursor() as db:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                db.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                yield query['sql'], [row[-1] for row in db.fetchall()]
+
+    def test_feeds_use_indexes(self):
+        """Тест что ленты читают записи по индексам........................."""
+        urls = [
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+            reverse('post', kwargs={
+                'username': self.heavy.username, 'post_id': self.post.id
+            }),
+            reverse('comments', kwargs={
+                'username': self.heavy.username, 'post_id': self.post.id
+            }),
+        ]
+        for url in urls:
+            for sql, plan in self.plans(url):
+                with self.subTest(url=url, sql=sql):
+                    for step in plan:
+                        scan = FULL_SCAN.match(step)
+                        self.assertFalse(
+                            scan and scan.group(1) not in WHOLE_TABLES,
+                            step
+                        )
+                        self.assertNotRegex(step, SORT)
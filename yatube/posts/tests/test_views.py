@@ -1,15 +1,36 @@
+import asyncio
+import importlib
+import json
+import os
+import re
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from io import BytesIO, StringIO
+from unittest import mock
 
+from asgiref.sync import async_to_sync
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
-from django.urls import reverse
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import (AsyncClient, Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from PIL import Image
+from yatube import urls as yatube_urls
+from yatube.metrics import registry
 
-from ..models import Comment, Follow, Group, Post, User
+from .. import thumbnails, variants
+from .. import urls as posts_urls
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..paginator import COMMENTS_PER_PAGE
 
 TEMP_MEDIA = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -112,6 +133,104 @@ class Test(TestCase):
         self.assertEqual(self.group.description, post.group.description)
         self.post_context_test(post)
 
+    def test_groups_read_from_registry(self):
+        """Тест что группы читаются из реестра и видят переименование......"""
+        group_url = reverse('group_posts', kwargs={'slug': self.group.slug})
+        urls = [group_url, reverse('new_post')]
+        for adress in urls:
+            self.authorized_client.get(adress)
+        for adress in urls:
+            with self.subTest(adress=adress):
+                # Cards are rendered again, their groups not read again.
+                Post.objects.update(version=F('version') + 1)
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(adress)
+                self.assertFalse([
+                    query['sql'] for query in queries
+                    if 'posts_group' in query['sql']
+                ])
+        self.group.title = 'Renamed Group'
+        self.group.save()
+        response = self.authorized_client.get(group_url)
+        self.assertEqual(response.context['group'].title, 'Renamed Group')
+        self.assertContains(response, '#Renamed Group')
+        response = self.authorized_client.get(reverse('new_post'))
+        self.assertIn(
+            (self.group.pk, 'Renamed Group'),
+            list(response.context['form'].fields['group'].choices)
+        )
+        response = self.authorized_client.get(
+            reverse('group_posts', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_group_unknown_to_registry(self):
+        """Тест группы, созданной и изменённой мимо реестра процесса......."""
+        self.authorized_client.get(reverse('new_post'))
+        # bulk_create и update не шлют сигналов, как другой процесс.
+        Group.objects.bulk_create([Group(
+            title='Elsewhere', slug='elsewhere', description='Elsewhere'
+        )])
+        response = self.authorized_client.get(
+            reverse('group_posts', kwargs={'slug': 'elsewhere'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        group = Group.objects.get(slug='elsewhere')
+        Group.objects.filter(pk=group.pk).update(title='Moved')
+        with override_settings(GROUPS_REGISTRY_TIMEOUT=0):
+            response = self.authorized_client.get(reverse('new_post'))
+        self.assertIn(
+            (group.pk, 'Moved'),
+            list(response.context['form'].fields['group'].choices)
+        )
+
+    def test_usernames_resolved_from_cache(self):
+        """Тест что имя пользователя из URL не ищется в базе повторно......"""
+        def queries_by_username(adress, status=HTTPStatus.OK):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(adress)
+            self.assertEqual(response.status_code, status)
+            return [query['sql'] for query in queries
+                    if '"auth_user"."username" =' in query['sql']]
+
+        profile = reverse('profile', kwargs={'username': self.user.username})
+        post = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        missing = reverse('profile', kwargs={'username': 'nobody'})
+        for adress, status in ((profile, HTTPStatus.OK), (post, HTTPStatus.OK),
+                               (missing, HTTPStatus.NOT_FOUND)):
+            with self.subTest(adress=adress):
+                cache.clear()
+                self.assertTrue(queries_by_username(adress, status))
+                self.client.force_login(self.user)
+                self.client.logout()
+                self.assertFalse(queries_by_username(adress, status))
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(profile).status_code,
+                         HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(reverse(
+            'profile', kwargs={'username': 'renamed'}
+        )).status_code, HTTPStatus.OK)
+        User.objects.create(username='nobody')
+        self.assertEqual(self.client.get(missing).status_code, HTTPStatus.OK)
+
+    def test_cards_follow_username_change(self):
+        """Тест ссылок карточек после переименования автора................."""
+        author = User.objects.create(username='old-name')
+        Post.objects.create(author=author, text='Renamed author')
+        self.client.get(reverse('index'))
+        author.username = 'new-name'
+        author.save()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, reverse(
+            'profile', kwargs={'username': 'new-name'}
+        ))
+        self.assertNotContains(response, reverse(
+            'profile', kwargs={'username': 'old-name'}
+        ))
+
     def test_new_post_post_edit_context_in_template(self):
         """Тест контекста new_post, edit_post..............................."""
         url = [
@@ -148,23 +267,175 @@ class Test(TestCase):
         post1 = response.context['post']
         self.post_context_test(post1)
 
+    def test_post_card_cache(self):
+        """Тест кэша карточек постов и кнопок автора........................"""
+        url = reverse('group_posts', kwargs={'slug': self.group.slug})
+        self.assertContains(self.authorized_client.get(url), 'Test test')
+        Post.objects.filter(pk=self.post.pk).update(text='Unseen')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Test test')
+        self.assertContains(response, 'Редактировать')
+        self.assertNotContains(Client().get(url), 'Редактировать')
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Edited'
+        post.save()
+        self.assertContains(self.authorized_client.get(url), 'Edited')
+
+    def test_thumbnail_generated_in_background(self):
+        """Тест что карточка показывает только готовую миниатюру............"""
+        url = reverse('group_posts', kwargs={'slug': self.group.slug})
+        self.assertIsNone(thumbnails.lookup(self.post.image))
+        self.assertContains(
+            self.authorized_client.get(url), self.post.image.url
+        )
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertContains(self.authorized_client.get(url), thumbnail.url)
+
+    def test_thumbnails_looked_up_in_bulk(self):
+        """Тест поиска миниатюр страницы одним запросом....................."""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        other = Post.objects.create(
+            author=self.user, text='Other', image='posts/missing.gif'
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            ready = thumbnails.lookup_many([self.post.image, other.image])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            ready[self.post.image.name].name,
+            thumbnails.lookup(self.post.image).name
+        )
+        self.assertIsNone(ready[other.image.name])
+
+    @override_settings(THUMBNAIL_ASYNC=False)
+    def test_thumbnail_made_by_request(self):
+        """Тест что без THUMBNAIL_ASYNC миниатюра готова после запроса......"""
+        buffer = BytesIO()
+        Image.new('RGB', (100, 100)).save(buffer, 'JPEG')
+        self.authorized_client.post(reverse('new_post'), data={
+            'text': 'With image',
+            'image': SimpleUploadedFile('new.jpg', buffer.getvalue()),
+        })
+        post = Post.objects.get(text='With image')
+        self.assertIsNotNone(thumbnails.lookup(post.image))
+
+    def test_thumbnail_job_keeps_its_storage(self):
+        """Тест что задача пишет миниатюру туда, где была поставлена......"""
+        moved = tempfile.mkdtemp(dir=TEMP_MEDIA)
+        buffer = BytesIO()
+        Image.new('RGB', (100, 100)).save(buffer, 'JPEG')
+        with override_settings(MEDIA_ROOT=moved):
+            post = Post.objects.create(
+                author=self.user, text='Moved',
+                image=SimpleUploadedFile('moved.jpg', buffer.getvalue())
+            )
+            storage = thumbnails.pinned_storage()
+        thumbnails.generate(post.pk, post.image.name, storage)
+        thumbnail = thumbnails.lookup(post.image)
+        self.assertTrue(
+            os.path.exists(os.path.join(moved, thumbnail.name))
+        )
+        self.assertFalse(default_storage.exists(thumbnail.name))
+
+    def test_image_variants_in_card(self):
+        """Тест адаптивных вариантов изображения в карточке................."""
+        buffer = BytesIO()
+        Image.new('RGB', (700, 400)).save(buffer, 'JPEG')
+        post = Post.objects.create(
+            author=self.user, text='Wide',
+            image=SimpleUploadedFile('wide.jpg', buffer.getvalue())
+        )
+        thumbnails.generate(post.pk, post.image.name)
+        post.refresh_from_db()
+        built = json.loads(post.image_variants)
+        self.assertEqual([width for width, _ in built['jpeg']], [320, 640])
+        self.assertTrue(default_storage.exists(built['webp'][0][1]))
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, default_storage.url(built['jpeg'][1][1]))
+
+        Post.objects.filter(pk=post.pk).update(image_variants='')
+        call_command('build_image_variants', workers=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(json.loads(post.image_variants).keys(), built.keys())
+
+    def test_image_variants_kept_apart(self):
+        """Тест что варианты картинок с одним именем не затирают друг друга"""
+        built = {}
+        for image_format, extension in (('JPEG', 'jpg'), ('PNG', 'png')):
+            buffer = BytesIO()
+            Image.new('RGB', (400, 200)).save(buffer, image_format)
+            post = Post.objects.create(
+                author=self.user, text=extension,
+                image=SimpleUploadedFile(f'same.{extension}',
+                                         buffer.getvalue())
+            )
+            thumbnails.generate(post.pk, post.image.name)
+            post.refresh_from_db()
+            built[extension] = variants.paths(json.loads(post.image_variants))
+        self.assertFalse(built['jpg'] & built['png'])
+        for extension, paths in built.items():
+            for path in paths:
+                self.assertIn(f'same-{extension}-', path)
+        for path in built['jpg'] | built['png']:
+            self.assertTrue(default_storage.exists(path), path)
+
+        call_command('build_image_variants', workers=1, all=True,
+                     stdout=StringIO())
+        for post in Post.objects.filter(text__in=built):
+            rebuilt = variants.paths(json.loads(post.image_variants))
+            for path in built[post.text] - rebuilt:
+                self.assertFalse(default_storage.exists(path), path)
+            for path in rebuilt:
+                self.assertTrue(default_storage.exists(path), path)
+
+    def feed_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('index'))
+        feed = [query for query in queries.captured_queries
+                if 'FROM "posts_post"' in query['sql']]
+        return response, len(feed)
+
     def test_cache(self):
         """Тест кэша........................................................"""
         # Первый вызов для проверки
         self.authorized_client.get(reverse('index'))
-        response = self.authorized_client.get(reverse('index'))
-        self.assertEqual(response.context, None)
+        response, feed = self.feed_queries(self.authorized_client)
+        self.assertEqual(feed, 0)
+        self.assertEqual(response.context['page'][0], self.post)
         post = Post.objects.create(
             author=self.user,
             text='CACHE')
-        # Вызов для проверки после создания поста
-        response = self.authorized_client.get(reverse('index'))
-        self.assertEqual(response.context, None)
-        cache.clear()
-        # Вызов для проверки после очистки кэша
-        response = self.authorized_client.get(reverse('index'))
-        self.assertNotEqual(response.context, None)
+        # Новый пост сразу сбрасывает кэш главной страницы
+        response, feed = self.feed_queries(self.authorized_client)
+        self.assertNotEqual(feed, 0)
         self.assertEqual(response.context['page'][0], post)
+        response, feed = self.feed_queries(self.authorized_client)
+        self.assertEqual(feed, 0)
+        Comment.objects.create(post=post, author=self.user, text='CACHE')
+        # Вызов для проверки после нового комментария
+        response, feed = self.feed_queries(self.authorized_client)
+        self.assertNotEqual(feed, 0)
+
+    def test_cache_shared_without_viewer(self):
+        """Кэш главной не показывает чужие меню и кнопки...................."""
+        edit = reverse('edit', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, edit)
+        self.assertContains(response, reverse('follow_index'))
+        other = Client()
+        other.force_login(User.objects.create(username='bob'))
+        for client in (other, Client()):
+            with self.subTest(client=client):
+                response, feed = self.feed_queries(client)
+                self.assertEqual(feed, 0)
+                self.assertNotContains(response, edit)
+        self.assertNotContains(response, reverse('follow_index'))
 
 
 class PaginatorViewsTest(TestCase):
@@ -211,6 +482,44 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(
                     response.paginator.page(2).object_list.count(), 3)
 
+    def test_feed_query_count_does_not_grow(self):
+        """Тест что число запросов ленты не зависит от числа постов........"""
+        def count_queries(adress):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(adress)
+            return len(queries)
+
+        before = {adress: count_queries(adress)
+                  for adress in self.sub_test_url}
+        Post.objects.filter(pk__in=Post.objects.all()[:5]).update(
+            group=Group.objects.create(title='Other', slug='other')
+        )
+        for adress in self.sub_test_url:
+            with self.subTest(adress=adress):
+                self.assertEqual(count_queries(adress), before[adress])
+                self.assertLessEqual(before[adress], 3)
+
+    def test_cursor_links_walk_all_posts(self):
+        """Тест перехода по курсорам вперёд и назад без пропусков........"""
+        for adress in self.sub_test_url:
+            with self.subTest(adress=adress):
+                first = self.client.get(adress).context['page']
+                self.assertIsNone(first.previous_cursor)
+                second = self.client.get(
+                    adress, {'after': first.next_cursor}
+                ).context['page']
+                self.assertEqual(len(second), 3)
+                self.assertIsNone(second.next_cursor)
+                self.assertEqual(
+                    list(first) + list(second),
+                    list(Post.objects.order_by('-pub_date', '-id'))
+                )
+                back = self.client.get(
+                    adress, {'before': second.previous_cursor}
+                ).context['page']
+                self.assertEqual(list(back), list(first))
+
 
 class CommentAndFollowTest(TestCase):
     @classmethod
@@ -225,6 +534,7 @@ class CommentAndFollowTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.client_guest = Client()
         self.client_auth = Client()
 
@@ -275,6 +585,38 @@ class CommentAndFollowTest(TestCase):
         ).exists())
         self.assertEqual(comments_count, 1)
 
+    def test_comments_paginated_and_loaded_on_demand(self):
+        """Тест постраничных комментариев и подгрузки следующих............"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user2, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        ])
+        kwargs = {'username': self.user1.username, 'post_id': self.post.id}
+        page = self.client_guest.get(
+            reverse('post', kwargs=kwargs)
+        ).context['comments']
+        self.assertEqual(len(page), COMMENTS_PER_PAGE)
+        self.assertIsNotNone(page.next_cursor)
+
+        url = reverse('comments', kwargs=kwargs)
+        response = self.client_guest.get(url, {'after': page.next_cursor})
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertIsNone(rest.next_cursor)
+        self.assertEqual(
+            [comment.id for comment in list(page) + list(rest)],
+            list(self.post.comments.order_by('-created', '-id')
+                 .values_list('id', flat=True))
+        )
+        self.assertNotContains(response, 'js-more-comments')
+
+        data = self.client_guest.get(
+            url, {'after': page.next_cursor, 'format': 'json'}
+        ).json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['author'], 'kekw')
+        self.assertIsNone(data['next_cursor'])
+
     def test_guest_user_cant_comment_post(self):
         """Тест что неавторизованный пользователь редиректит на логин......."""
         url_kwarg = {'username': self.user1, 'post_id': self.post.id}
@@ -294,6 +636,62 @@ class CommentAndFollowTest(TestCase):
             author=self.user1, post=self.post.id).count()
         self.assertEqual(comments_count, 0)
 
+    def test_follow_state_read_once_per_request(self):
+        """Тест состояния подписки одним запросом на страницу.............."""
+        user3 = User.objects.create_user(username='third')
+        for author in (self.user2, user3):
+            Post.objects.create(text='post', author=author)
+        Follow.objects.create(user=self.user1, author=self.user2)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_auth.get(reverse('index'))
+        follow_queries = [
+            query for query in queries if 'posts_follow' in query['sql']
+        ]
+        self.assertEqual(len(follow_queries), 1)
+        self.assertContains(response, 'Отписаться', count=1)
+        self.assertContains(response, 'Подписаться', count=1)
+
+        profile = reverse('profile', kwargs={'username': user3.username})
+        with CaptureQueriesContext(connection) as queries:
+            self.client_auth.get(profile)
+        self.assertFalse(
+            [query for query in queries if 'posts_follow' in query['sql']]
+        )
+        self.client_auth.get(
+            reverse('profile_follow', kwargs={'username': user3.username})
+        )
+        self.assertContains(self.client_auth.get(profile), 'Отписаться')
+
+    def test_index_follow_button_after_follow(self):
+        """Тест что кнопка подписки на главной меняется после подписки......"""
+        Post.objects.create(text='example2', author=self.user2)
+        follow = reverse('profile_follow', kwargs={'username': self.user2})
+        unfollow = reverse('profile_unfollow',
+                           kwargs={'username': self.user2})
+        self.assertContains(self.client_auth.get(reverse('index')), follow)
+        self.client_auth.get(follow)
+        response = self.client_auth.get(reverse('index'))
+        self.assertContains(response, unfollow)
+        self.assertNotContains(response, follow)
+        self.client_auth.get(unfollow)
+        self.assertContains(self.client_auth.get(reverse('index')), follow)
+
+    def test_index_follow_button_per_viewer(self):
+        """Тест что кнопка подписки на главной своя у каждого читателя......"""
+        Post.objects.create(text='example2', author=self.user2)
+        Follow.objects.create(user=self.user1, author=self.user2)
+        unfollow = reverse('profile_unfollow',
+                           kwargs={'username': self.user2})
+        self.assertContains(self.client_auth.get(reverse('index')), unfollow)
+        other = Client()
+        other.force_login(User.objects.create_user(username='reader'))
+        response = other.get(reverse('index'))
+        self.assertNotContains(response, unfollow)
+        self.assertContains(response, reverse(
+            'profile_follow', kwargs={'username': self.user2}
+        ))
+
     def test_new_post_appears_in_follow_index(self):
         """Тест того что пост появился в списке у подписки.................."""
         post = Post.objects.create(
@@ -316,3 +714,336 @@ class CommentAndFollowTest(TestCase):
             reverse('follow_index')
         ).context.get('page')
         self.assertEqual(follow_page.paginator.object_list.count(), 0)
+
+    def test_follow_index_reads_timeline(self):
+        """Тест что пост подписки попадает в ленту через таймлайн..........."""
+        Follow.objects.create(user=self.user1, author=self.user2)
+        post = Post.objects.create(text='example3', author=self.user2)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user1, post=post
+        ).exists())
+        response = self.client_auth.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), [post])
+
+        self.client_auth.get(
+            reverse('profile_unfollow', kwargs={'username': self.user2})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user1
+        ).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_index_pulls_heavy_authors(self):
+        """Тест что посты популярного автора читаются без таймлайна........"""
+        old = Post.objects.create(text='old', author=self.user2)
+        Follow.objects.create(user=self.user1, author=self.user2)
+        new = Post.objects.create(text='new', author=self.user2)
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.client_auth.get(reverse('follow_index'))
+        self.assertEqual(list(response.context['page']), [new, old])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_index_pulls_heavy_authors_at_once(self):
+        """Тест что посты популярных авторов читаются одним запросом......"""
+        authors = [self.user2] + [
+            User.objects.create_user(username=f'heavy{i}') for i in range(3)
+        ]
+        posts = [Post.objects.create(text=f'post {author}', author=author)
+                 for author in authors]
+        counts = []
+        for author in authors:
+            Follow.objects.create(user=self.user1, author=author)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client_auth.get(reverse('follow_index'))
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, counts)
+        self.assertEqual(list(response.context['page']), posts[::-1])
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_follow_backfills_latest_posts(self):
+        """Тест что подписка копирует в таймлайн только новые посты......."""
+        posts = [Post.objects.create(text=f'post {i}', author=self.user2)
+                 for i in range(3)]
+        self.client_auth.get(
+            reverse('profile_follow', kwargs={'username': self.user2})
+        )
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.user1
+            ).values_list('post', flat=True)),
+            {posts[1].pk, posts[2].pk}
+        )
+
+
+class StreamingPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        for i in range(3):
+            cls.post = Post.objects.create(
+                text=f'Post {i}', author=cls.author, group=cls.group
+            )
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Comment {i}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_streamed_pages_match_rendered(self):
+        """Тест что потоковая страница совпадает с обычной................"""
+        def normalized(html):
+            html = re.sub(r'name="csrfmiddlewaretoken" value="\w+"', '', html)
+            # The loop indents the items, the stream does not.
+            return re.sub(r'>\s+<', '><', html)
+
+        urls = [
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+            reverse('post', kwargs={
+                'username': self.author.username, 'post_id': self.post.id
+            }),
+        ]
+        for adress in urls:
+            with self.subTest(adress=adress):
+                rendered = self.client.get(adress)
+                self.assertFalse(rendered.streaming)
+                with override_settings(STREAM_PAGES=True):
+                    response = self.client.get(adress)
+                    self.assertTrue(response.streaming)
+                    chunks = [chunk.decode()
+                              for chunk in response.streaming_content]
+                self.assertIn('navbar', chunks[0])
+                self.assertNotIn('Post 0', chunks[0])
+                self.assertEqual(len(chunks), 2 + 3)
+                self.assertEqual(normalized(''.join(chunks)),
+                                 normalized(rendered.content.decode()))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_ASYNC=True)
+class ThumbnailJobTest(TransactionTestCase):
+    """Миниатюры из пула потоков после сохранения поста.
+
+    Задача читает пост в своём потоке, поэтому данные должны быть
+    записаны в базу, а не остаться в транзакции ``TestCase``.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='uploader')
+        self.client.force_login(self.user)
+
+    def test_thumbnail_made_by_queued_job(self):
+        """Тест что миниатюру делает задача, поставленная запросом.........."""
+        jobs = []
+        submit = ThreadPoolExecutor.submit
+
+        def record(executor, *args):
+            jobs.append(submit(executor, *args))
+            return jobs[-1]
+
+        buffer = BytesIO()
+        Image.new('RGB', (700, 400)).save(buffer, 'JPEG')
+        with mock.patch.object(ThreadPoolExecutor, 'submit', record):
+            self.client.post(reverse('new_post'), data={
+                'text': 'Queued',
+                'image': SimpleUploadedFile('queued.jpg', buffer.getvalue()),
+            })
+        self.assertEqual(len(jobs), 1)
+        jobs[0].result()
+        post = Post.objects.get(text='Queued')
+        self.assertIsNotNone(thumbnails.lookup(post.image))
+        self.assertEqual(post.version, 1)
+        self.assertTrue(json.loads(post.image_variants))
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncViewsTest(TransactionTestCase):
+    """Страницы ``posts.async_views`` через ASGI-обработчик Django.
+
+    Асинхронные представления читают в своих потоках, которым не видны
+    данные незавершённой транзакции ``TestCase``.
+    """
+
+    @classmethod
+    def route(cls):
+        importlib.reload(posts_urls)
+        importlib.reload(yatube_urls)
+        clear_url_caches()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.route()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.route()
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Group', slug='group')
+        self.posts = [
+            Post.objects.create(
+                text=f'Post {i}', author=self.author, group=self.group
+            )
+            for i in range(3)
+        ][::-1]
+        self.post = self.posts[0]
+        for i in range(3):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'Comment {i}'
+            )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client = AsyncClient()
+        self.client.force_login(self.reader)
+
+    def get(self, adress):
+        async def get():
+            return await self.client.get(adress)
+        return async_to_sync(get)()
+
+    def test_async_pages(self):
+        """Тест асинхронных страниц, их подписок и бюджета запросов........"""
+        feeds = {
+            'index': reverse('index'),
+            'group_posts': reverse('group_posts',
+                                   kwargs={'slug': self.group.slug}),
+            'profile': reverse('profile',
+                               kwargs={'username': self.author.username}),
+            'follow_index': reverse('follow_index'),
+        }
+        post = reverse('post', kwargs={
+            'username': self.author.username, 'post_id': self.post.id
+        })
+        for name, adress in {**feeds, 'post': post}.items():
+            with self.subTest(adress=adress):
+                view = resolve(adress).func
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+                response = self.get(adress)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                if name in feeds:
+                    self.assertEqual(list(response.context['page']),
+                                     self.posts)
+                if name != 'index':
+                    self.assertContains(response, 'Отписаться')
+                # Запросы из рабочих потоков тоже учтены в метриках.
+                queries = registry.views[name]['queries']
+                self.assertGreater(queries, 0)
+                self.assertLessEqual(queries, view.query_budget)
+        response = self.get(post)
+        self.assertEqual(response.context['post'], self.post)
+        self.assertEqual(len(response.context['comments']), 3)
+
+    def test_async_pages_not_found_and_login(self):
+        """Тест 404 и входа на асинхронных страницах......................"""
+        for adress in (
+            reverse('profile', kwargs={'username': 'nobody'}),
+            reverse('group_posts', kwargs={'slug': 'nothing'}),
+            reverse('post', kwargs={
+                'username': self.reader.username, 'post_id': self.post.id
+            }),
+        ):
+            with self.subTest(adress=adress):
+                self.assertEqual(self.get(adress).status_code,
+                                 HTTPStatus.NOT_FOUND)
+        self.client.logout()
+        response = self.get(reverse('follow_index'))
+        self.assertRedirects(
+            response, f'{settings.LOGIN_URL}?next={reverse("follow_index")}',
+            fetch_redirect_response=False
+        )
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='kekoslav')
+        cls.other = User.objects.create(username='other')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='Про котов'
+        )
+        cls.best = Post.objects.create(
+            text='кошка кошка <b>кошка</b>', author=cls.user, group=cls.group
+        )
+        cls.worse = Post.objects.create(
+            text='кошка и собака ' + 'слово ' * 30, author=cls.other
+        )
+        for i in range(12):
+            Post.objects.create(text=f'собака {i}', author=cls.user)
+
+    def search(self, **params):
+        response = self.client.get(reverse('search'), params)
+        return response, response.context['page']
+
+    def test_search_ranks_and_highlights(self):
+        """Тест ранжирования и подсветки результатов поиска................"""
+        response, page = self.search(q='Кошка')
+        self.assertEqual(list(page), [self.best, self.worse])
+        self.assertContains(
+            response,
+            '<mark>кошка</mark> &lt;b&gt;<mark>кошка</mark>&lt;/b&gt;'
+        )
+        self.assertEqual(list(self.search(q='кошка AND (')[1]), [])
+
+    def test_search_filters(self):
+        """Тест фильтров поиска по группе и автору........................."""
+        self.assertEqual(
+            list(self.search(q='кошка', group='cats')[1]), [self.best]
+        )
+        self.assertEqual(
+            list(self.search(q='кошка', author='other')[1]), [self.worse]
+        )
+        response = self.client.get(
+            reverse('search'), {'q': 'кошка', 'author': 'nobody'}
+        )
+        self.assertIsNone(response.context['page'])
+
+    def test_search_index_follows_changes(self):
+        """Тест обновления поискового индекса при изменениях..............."""
+        Post.objects.filter(pk=self.worse.pk).update(text='попугай')
+        self.assertEqual(list(self.search(q='попугай')[1]), [self.worse])
+        self.assertEqual(list(self.search(q='кошка')[1]), [self.best])
+        self.group.title = 'Коты'
+        self.group.save()
+        self.assertEqual(list(self.search(q='коты')[1]), [self.best])
+        Post.objects.filter(pk=self.best.pk).delete()
+        self.assertEqual(list(self.search(q='коты')[1]), [])
+
+    def test_search_cursor_keeps_query(self):
+        """Тест перехода по страницам поиска с сохранением запроса........."""
+        response, first = self.search(q='собака', author='kekoslav')
+        self.assertEqual(len(first), 10)
+        self.assertContains(response, 'q=%D1%81%D0%BE%D0%B1%D0%B0%D0%BA%D0%B0')
+        second = self.search(
+            q='собака', author='kekoslav', after=first.next_cursor
+        )[1]
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(
+            {post.pk for post in list(first) + list(second)},
+            set(Post.objects.filter(
+                author=self.user, text__startswith='собака'
+            ).values_list('pk', flat=True))
+        )
+        back = self.search(
+            q='собака', author='kekoslav', before=second.previous_cursor
+        )[1]
+        self.assertEqual(list(back), list(first))
@@ -0,0 +1,173 @@
+"""Thumbnails made in the background instead of while rendering.
+
+``{% thumbnail %}`` decodes and resizes an upload inside the first
+request that shows it. Here ``new_post`` and ``edit_post`` queue the
+image to a thread pool once the post is committed, and post cards only
+look up finished thumbnails with ``lookup``; until one is ready the card
+shows the original image. With ``THUMBNAIL_ASYNC`` off, as in tests that
+need the thumbnails at once, they are made within the request instead.
+
+A queued job writes to the storage as it was when the job was queued,
+even if ``MEDIA_ROOT`` has changed by the time it runs.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+from . import caching, variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def thumbnail_options(source, options):
+    """``options`` completed with the defaults ``get_thumbnail`` adds."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry, options, storage=None):
+    """The ``ImageFile`` sorl would produce, without producing it."""
+    source = ImageFile(image, storage)
+    options = thumbnail_options(source, options)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, storage or default.storage)
+
+
+def make_thumbnail(name, geometry, options, storage):
+    """``get_thumbnail`` reading ``name`` from and writing to ``storage``.
+
+    sorl always writes to its own default storage. The alternative
+    resolutions of ``get_thumbnail`` are not made; none are configured.
+    """
+    source = ImageFile(name, storage)
+    thumbnail = thumbnail_file(source, geometry, options, storage)
+    if not thumbnail.exists():
+        options = thumbnail_options(source, options)
+        image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(image)
+            source.set_size(default.engine.get_image_size(image))
+            default.backend._create_thumbnail(
+                image, geometry, options, thumbnail
+            )
+        finally:
+            default.engine.cleanup(image)
+    default.kvstore.get_or_set(source)
+    default.kvstore.set(thumbnail, source)
+    return thumbnail
+
+
+def pinned_storage():
+    """``default_storage`` fixed to its current location and URL."""
+    if isinstance(default_storage, FileSystemStorage):
+        return FileSystemStorage(
+            location=default_storage.location,
+            base_url=default_storage.base_url
+        )
+    return default_storage
+
+
+def lookup(image, size='card'):
+    """Return the finished thumbnail of ``image`` or ``None``."""
+    if not image:
+        return None
+    geometry, options = settings.THUMBNAIL_SIZES[size]
+    return default.kvstore.get(thumbnail_file(image, geometry, options))
+
+
+def lookup_many(images, size='card'):
+    """Map every image name to its finished thumbnail or ``None``.
+
+    With sorl's default cached-db store this is one ``get_many`` on the
+    cache plus, for keys the cache has never seen, one database query,
+    instead of a cache and database round trip per image.
+    """
+    geometry, options = settings.THUMBNAIL_SIZES[size]
+    thumbs = {
+        image.name: thumbnail_file(image, geometry, options)
+        for image in images if image
+    }
+    store = default.kvstore
+    if not isinstance(store, CachedDBStore):
+        return {name: store.get(thumb) for name, thumb in thumbs.items()}
+    keys = {add_prefix(thumb.key): name for name, thumb in thumbs.items()}
+    values = store.cache.get_many(list(keys))
+    missing = set(keys) - set(values)
+    if missing:
+        found = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        store.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        name: None if values[key] == EMPTY_VALUE
+        else deserialize_image_file(values[key])
+        for key, name in keys.items()
+    }
+
+
+def generate(post_id, name, storage=None):
+    """Make every size and variant of ``name`` and refresh its post card."""
+    storage = storage or default_storage
+    try:
+        for geometry, options in settings.THUMBNAIL_SIZES.values():
+            make_thumbnail(name, geometry, options, storage)
+        built = variants.build(name, storage)
+    except Exception:
+        logger.exception('Thumbnails for %s failed', name)
+        return
+    # The image may have been replaced while this one was processed.
+    Post.objects.filter(pk=post_id, image=name).update(
+        image_variants=json.dumps(built), version=F('version') + 1
+    )
+    caching.bump_version(caching.INDEX_PAGE)
+
+
+def _run(post_id, name, storage):
+    try:
+        generate(post_id, name, storage)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Queue thumbnails of a saved post, once its transaction commits."""
+    global _executor
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_ASYNC:
+        generate(post.pk, post.image.name)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    job = (post.pk, post.image.name, pinned_storage())
+    transaction.on_commit(lambda: _executor.submit(_run, *job))
@@ -0,0 +1,122 @@
+"""Fan-out timelines for the follow feed.
+
+Posts of ordinary authors are pushed into a ``TimelineEntry`` row per
+follower when they are published, so ``follow_index`` reads one index
+range instead of joining ``Post`` to ``Follow``. Authors with more than
+``TIMELINE_FANOUT_LIMIT`` followers are not pushed; their posts are
+pulled with the join at read time and merged in. A new follow copies
+only the author's latest ``TIMELINE_BACKFILL_LIMIT`` posts into the
+follower's timeline.
+"""
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import CursorPaginator
+
+BATCH_SIZE = 500
+
+
+def pushes(author_id):
+    return not UserStats.objects.filter(
+        user_id=author_id, fan_out=False
+    ).exists()
+
+
+def push_post(post):
+    """Put a new post into the timelines of its author's followers."""
+    if not pushes(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+def backfill(user_id, author_id):
+    """Copy the posts of a newly followed author into a timeline."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    UserStats.objects.filter(
+        user_id=author_id, fan_out=True, followers_count__gt=limit
+    ).update(fan_out=False)
+    if not pushes(author_id):
+        return
+    # Newest first along the (author, pub_date, id) index.
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Cursor pages of the follow feed of ``user``.
+
+    ``object_list`` is the plain join, kept for callers that want to
+    count; pages are read from the timeline plus the pulled authors.
+    """
+
+    def __init__(self, object_list, per_page, user):
+        self.user = user
+        super().__init__(object_list, per_page)
+
+    timeline_keys = ('timeline_entries__pub_date', 'timeline_entries__post')
+
+    def fetch(self, position, forward, limit):
+        rows = list(Post.objects.for_feed().filter(
+            self.seek(position, forward, self.timeline_keys),
+            timeline_entries__user=self.user
+        ).order_by(*[
+            # F() sorts by the post_id column itself; the plain name would
+            # be expanded to Post.Meta.ordering and defeat the index.
+            F(key).desc() if forward else F(key).asc()
+            for key in self.timeline_keys
+        ])[:limit])
+
+        pulled = list(Follow.objects.filter(
+            user=self.user, author__stats__fan_out=False
+        ).values_list('author_id', flat=True))
+        if pulled:
+            known = {post.id for post in rows}
+            rows += [
+                post for post in self.pull(pulled, position, forward, limit)
+                if post.id not in known
+            ]
+            rows.sort(key=self.position, reverse=forward)
+        return rows[:limit]
+
+    def pull(self, author_ids, position, forward, limit):
+        """The next ``limit`` posts of each author, in one statement.
+
+        Each author gets a subquery of its own that walks the author's
+        (author, pub_date, id) index; a single ``author_id IN (...)``
+        would sort all their posts. The rows come back unordered.
+        """
+        direction = '-' if forward else ''
+        return Post.objects.for_feed().filter(reduce(or_, (
+            Q(id__in=Post.objects.filter(
+                self.seek(position, forward), author_id=author_id
+            ).order_by(
+                direction + 'pub_date', direction + 'id'
+            ).values('id')[:limit])
+            for author_id in author_ids
+        ))).order_by()
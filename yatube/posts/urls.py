@@ -1,29 +1,39 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# Under ASGI the read-heavy pages are served by their async versions.
+reads = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('404/', views.page_not_found),
     path('500/', views.server_error),
-    path('', views.index,
+    path('', reads.index,
          name='index'
          ),
-    path('group/<slug:slug>/', views.group_posts,
+    path('group/<slug:slug>/', reads.group_posts,
          name='group_posts'
          ),
     path('new/', views.new_post,
          name='new_post'
          ),
-    path('follow/', views.follow_index,
+    path('follow/', reads.follow_index,
          name='follow_index'
          ),
+    path('search/', views.search,
+         name='search'
+         ),
+    path('export/', views.export_data,
+         name='export'
+         ),
     path('delete/post/<int:post_id>', views.delete_post,
          name='delete_post'
          ),
     path('delete/comment/<int:comment_id>', views.delete_comment,
          name='delete_comment'
          ),
-    path('<str:username>/', views.profile,
+    path('<str:username>/', reads.profile,
          name='profile'
          ),
     path('<str:username>/follow/', views.profile_follow,
@@ -32,11 +42,14 @@ urlpatterns = [
     path('<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'
          ),
-    path('<str:username>/<int:post_id>/', views.post_view,
+    path('<str:username>/<int:post_id>/', reads.post_view,
          name='post'
          ),
     path('<username>/<int:post_id>/comment/', views.add_comment,
          name='add_comment'
          ),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='comments'
+         ),
     path('<str:username>/<int:post_id>/edit/', views.edit_post, name='edit')
 ]
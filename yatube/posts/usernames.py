@@ -0,0 +1,89 @@
+"""Usernames resolved to user ids through the cache.
+
+Almost every URL carries a username. Once a name has been seen, its
+user id is kept in the cache and views look their rows up by that id
+instead of joining ``auth_user`` on the name. Unknown names are cached
+too, as ``MISSING``, so requests for profiles that do not exist stop
+reaching the database. Saving or deleting a user drops the entries of
+its old and new username.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .models import User
+
+MISSING = 0
+
+
+def _key(username):
+    # Names from the URL may hold characters a cache key must not.
+    digest = hashlib.md5(username.encode()).hexdigest()
+    return f'username:{digest}'
+
+
+def remember(username, pk):
+    """Cache the id of ``username``, or that there is no such user."""
+    cache.set(_key(username), pk or MISSING, (
+        settings.USERNAME_CACHE_TIMEOUT if pk
+        else settings.USERNAME_MISSING_CACHE_TIMEOUT
+    ))
+
+
+def user_id(username):
+    """Id of the user called ``username``, ``None`` if there is none."""
+    pk = cache.get(_key(username))
+    if pk is None:
+        pk = User.objects.filter(username=username).values_list(
+            'pk', flat=True
+        ).first()
+        remember(username, pk)
+    return pk or None
+
+
+def user_id_or_404(username):
+    pk = user_id(username)
+    if pk is None:
+        raise Http404('Такого пользователя нет')
+    return pk
+
+
+def get_for_username_or_404(queryset, username, user_field=None,
+                            **lookups):
+    """``get_object_or_404`` of the object of ``queryset`` by ``username``.
+
+    ``user_field`` names the foreign key to the user, or is ``None`` when
+    ``queryset`` holds users. A cached id replaces the name in the
+    lookup; otherwise the object is found by name and its user id is
+    remembered, so the first request costs no extra query.
+    """
+    pk = cache.get(_key(username))
+    if pk == MISSING:
+        raise Http404('Такого пользователя нет')
+    if user_field is None:
+        by_id, by_name, attname = 'pk', 'username', 'pk'
+    else:
+        by_id = attname = f'{user_field}_id'
+        by_name = f'{user_field}__username'
+    if pk is not None:
+        return get_object_or_404(queryset, **lookups, **{by_id: pk})
+    try:
+        obj = get_object_or_404(queryset, **lookups, **{by_name: username})
+    except Http404:
+        if user_field is None:
+            remember(username, None)
+        raise
+    remember(username, getattr(obj, attname))
+    return obj
+
+
+def forget(*usernames):
+    """Drop the cached ids of ``usernames`` after a user changed."""
+    keys = [_key(username) for username in usernames if username]
+    cache.delete_many(keys)
+    # A request may cache the old id again before the change commits.
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,111 @@
+"""Responsive variants of post images.
+
+Every card used to load one 960px JPEG crop whatever the screen. Here
+each upload is also cropped to the card's shape at ``IMAGE_VARIANT_WIDTHS``
+in each of ``IMAGE_VARIANT_FORMATS`` that this Pillow can write, and the
+files are stored next to the original as ``<stem>-<ext>-<width>w.<ext>``
+(``a.jpg`` and ``a.png`` get variants of their own). A name already
+taken gets a free one from the storage; files are never replaced. The
+card offers them through ``<picture>``/``srcset`` so the browser picks
+the smallest file that fits.
+
+``build`` only touches storage, not the database, so it runs in the
+thumbnail worker and in the processes of ``build_image_variants`` alike.
+"""
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def formats():
+    """The configured formats this Pillow can save, best first."""
+    Image.init()
+    return [
+        name for name in settings.IMAGE_VARIANT_FORMATS
+        if name.upper() in Image.SAVE
+    ]
+
+
+def widths(source_width):
+    """Configured widths not wider than the source, at least the smallest."""
+    configured = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    return [
+        width for width in configured if width <= source_width
+    ] or configured[:1]
+
+
+def variant_name(name, width, image_format):
+    stem, extension = os.path.splitext(name)
+    if extension:
+        stem = f'{stem}-{extension[1:]}'
+    return f'{stem}-{width}w.{EXTENSIONS[image_format]}'
+
+
+def encode(image, image_format):
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(
+        buffer, image_format.upper(),
+        quality=settings.IMAGE_VARIANT_QUALITY, optimize=True
+    )
+    return buffer.getvalue()
+
+
+def build(name, storage=default_storage):
+    """Write the variants of the image ``name`` kept in ``storage``.
+
+    Returns ``{format: [[width, name], ...]}``, the value kept in
+    ``Post.image_variants``.
+    """
+    with storage.open(name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+    ratio_width, ratio_height = settings.IMAGE_VARIANT_RATIO
+    variants = {}
+    for width in widths(original.width):
+        height = round(width * ratio_height / ratio_width)
+        image = ImageOps.fit(original, (width, height), Image.LANCZOS)
+        for image_format in formats():
+            path = storage.save(
+                variant_name(name, width, image_format),
+                ContentFile(encode(image, image_format))
+            )
+            variants.setdefault(image_format, []).append([width, path])
+    return variants
+
+
+def paths(variants):
+    """Names of the files in a value returned by ``build``."""
+    return {path for built in variants.values() for _, path in built}
+
+
+def sources(post):
+    """``<source>`` attributes for the card of ``post``, best format first."""
+    if not post.image or not post.image_variants:
+        return []
+    variants = json.loads(post.image_variants)
+    return [
+        {
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(
+                f'{default_storage.url(path)} {width}w'
+                for width, path in variants[image_format]
+            ),
+        }
+        for image_format in MIME_TYPES if image_format in variants
+    ]
@@ -1,18 +1,31 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-
-from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-
-
-@cache_page(15, key_prefix='index_page')
+from yatube.metrics import query_budget
+from yatube.replicas import replica_reads
+
+from . import export, groups, thumbnails, usernames
+from .caching import INDEX_PAGE, cached_cursor_page
+from .cards import prefetch_cards, render_card
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Post, User
+from .paginator import COMMENTS_PER_PAGE, paginate
+from .search import SearchPaginator
+from .streaming import comment_renderer, render_streamed
+from .timeline import TimelinePaginator
+
+
+@query_budget(6)
+@replica_reads
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = cached_cursor_page(
+        request, INDEX_PAGE, Post.objects.for_feed(),
+        settings.INDEX_CACHE_TIMEOUT
+    )
+    prefetch_cards(page)
     return render(
         request,
         'posts/index.html',
@@ -20,58 +33,122 @@ def index(request):
     )
 
 
+@query_budget(6)
+@replica_reads
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    group = groups.by_slug(slug)
+    if group is None:
+        raise Http404('Такой группы нет')
+    posts_list = Post.objects.for_feed().filter(group_id=group.pk)
+    page = paginate(request, posts_list)
+    return render_feed(
         request,
         'posts/group.html',
         {'group': group, 'page': page}
     )
 
 
+@query_budget(7)
+@replica_reads
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_list = author.posts.all()
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    user = request.user
-    following = Follow.objects.filter(
-        user__username=user, author=author
-    ).exists() if user.is_authenticated else False
-
-    return render(
+    author = usernames.get_for_username_or_404(
+        User.objects.select_related('stats'), username
+    )
+    posts_list = author.posts.for_feed()
+    page = paginate(request, posts_list)
+    return render_feed(
         request,
         'posts/profile.html',
-        {'author': author, 'page': page, 'following': following}
+        {'author': author, 'page': page}
     )
 
 
+def render_feed(request, template_name, context):
+    """Render a page of post cards, streaming them with STREAM_PAGES."""
+    return render_streamed(
+        request, template_name, context, context['page'],
+        lambda post: render_card(post, request.user, request),
+        prepare=prefetch_cards
+    )
+
+
+def comment_page(request, post_id):
+    return paginate(
+        request, Comment.objects.filter(post_id=post_id).select_related(
+            'author'
+        ),
+        per_page=COMMENTS_PER_PAGE, keys=('created', 'id')
+    )
+
+
+@query_budget(7)
+@replica_reads
 def post_view(request, username, post_id):
-    post = get_object_or_404(
-        Post.objects.select_related('author'),
-        id=post_id, author__username=username
+    post = usernames.get_for_username_or_404(
+        Post.objects.select_related('author', 'author__stats'), username,
+        user_field='author', id=post_id
     )
     form = CommentForm()
-    comments = post.comments.all()
-    following = Follow.objects.filter(
-        user__username=request.user,
-        author=post.author
-    ).exists() if request.user.is_authenticated else False
-    return render(
+    comments = comment_page(request, post.pk)
+    return render_streamed(
         request,
         'posts/post.html',
         {'post': post,
          'form': form,
-         'comments': comments,
-         'following': following}
+         'comments': comments},
+        comments, comment_renderer(request, post)
     )
 
 
+@query_budget(4)
+@replica_reads
+def post_comments(request, username, post_id):
+    """Next page of comments, as HTML for the post page or as JSON."""
+    post = usernames.get_for_username_or_404(
+        Post.objects.select_related('author'), username,
+        user_field='author', id=post_id
+    )
+    page = comment_page(request, post.pk)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {'id': comment.id,
+                 'author': comment.author and comment.author.username,
+                 'text': comment.text,
+                 'created': comment.created.isoformat()}
+                for comment in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
+    return render(
+        request,
+        'posts/includes/comment_list.html',
+        {'post': post, 'comments': page}
+    )
+
+
+@query_budget(5)
+@replica_reads
+def search(request):
+    form = SearchForm(request.GET or None)
+    page = None
+    if form.is_valid() and form.cleaned_data['q']:
+        group, author = form.cleaned_data['group'], form.cleaned_data['author']
+        page = paginate(
+            request, Post.objects.for_feed(),
+            paginator_class=SearchPaginator,
+            query=form.cleaned_data['q'],
+            group=group and group.pk,
+            author=author and author.pk
+        )
+    return render(
+        request,
+        'posts/search.html',
+        {'form': form, 'page': page}
+    )
+
+
+@query_budget(9)
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -85,9 +162,11 @@ def new_post(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.schedule(post)
     return redirect('index')
 
 
+@query_budget(8)
 def delete_post(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user == post.author:
@@ -95,9 +174,12 @@ def delete_post(request, post_id):
     return redirect('index')
 
 
+@query_budget(7)
 @login_required
 def edit_post(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = usernames.get_for_username_or_404(
+        Post, username, user_field='author', id=post_id
+    )
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=post
     )
@@ -109,13 +191,18 @@ def edit_post(request, username, post_id):
                 {'form': form,
                  'post': post}
             )
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
     return redirect('post', username=username, post_id=post_id)
 
 
+@query_budget(5)
 @login_required
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = usernames.get_for_username_or_404(
+        Post, username, user_field='author', id=post_id
+    )
     form = CommentForm(request.POST or None)
     if not form.is_valid():
         return render(
@@ -132,6 +219,7 @@ def add_comment(request, username, post_id):
 
 
 
+@query_budget(8)
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)
     if request.user == comment.author or request.user == comment.post.author:
@@ -143,27 +231,34 @@ def delete_comment(request, comment_id):
     )
 
 
+@query_budget(7)
 @login_required
+@replica_reads
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    post_list = Post.objects.for_feed().filter(
+        author__following__user=request.user
+    )
+    page = paginate(
+        request, post_list,
+        paginator_class=TimelinePaginator, user=request.user
+    )
+    return render_feed(
         request,
         'posts/follow.html',
-        {'page': page, 'paginator': paginator}
+        {'page': page, 'paginator': page.paginator}
     )
 
 
+@query_budget(13)
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    author_id = usernames.user_id_or_404(username)
+    if author_id != request.user.pk:
+        Follow.objects.get_or_create(user=request.user, author_id=author_id)
     return redirect('profile', username=username)
 
 
+@query_budget(7)
 @login_required
 def profile_unfollow(request, username):
     Follow.objects.filter(
@@ -173,6 +268,28 @@ def profile_unfollow(request, username):
     return redirect('profile', username=username)
 
 
+@query_budget(6)
+@staff_member_required
+def export_data(request):
+    data_format = request.GET.get('format', 'jsonl')
+    tables = request.GET.getlist('table') or list(export.TABLES)
+    if (data_format not in export.FORMATS
+            or not set(tables) <= export.TABLES.keys()
+            or data_format == 'csv' and len(tables) != 1):
+        return HttpResponseBadRequest(
+            'Неверный формат или таблица; CSV выгружает одну таблицу.'
+        )
+    response = StreamingHttpResponse(
+        export.stream(data_format, tables),
+        content_type=export.FORMATS[data_format]
+    )
+    name = tables[0] if len(tables) == 1 else 'yatube'
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{data_format}"'
+    )
+    return response
+
+
 def page_not_found(request, exception=None):
     return render(
         request,
@@ -0,0 +1,16 @@
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('YATUBE_ASYNC_VIEWS', '1')
+
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    # Django 3.2 runs the sync code of all requests in one shared
+    # thread; give every request a thread of its own, as Django 4 does.
+    async with ThreadSensitiveContext():
+        await django_application(scope, receive, send)
@@ -0,0 +1,248 @@
+"""Cache backend shared by all worker processes on one host.
+
+``LocMemCache`` lives inside a single process: every gunicorn worker
+warms its own copy and ``bump_version`` in one worker never reaches the
+others. ``SQLiteCache`` keeps the entries in one SQLite file in WAL
+mode instead, so any number of processes read and write the same cache
+without a cache server. The file is capped by ``MAX_ENTRIES`` and
+``MAX_SIZE`` (bytes of pickled values); the least recently used entries
+are evicted first.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 50000, 'MAX_SIZE': 256 * 2 ** 20},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_totals SET entries = entries + 1, size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_totals SET entries = entries - 1, size = size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_totals SET size = size - old.size + new.size;
+END;
+'''
+
+# Reads refresh an entry's LRU position at most this often, so that hot
+# keys do not turn every cache hit into a write.
+TOUCH_INTERVAL = 10
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 2 ** 20))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Connections are per thread and are never reused after a fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = sqlite3.connect(
+                self._path, timeout=self._busy_timeout, isolation_level=None
+            )
+            local.db.execute('PRAGMA journal_mode=WAL')
+            local.db.execute('PRAGMA synchronous=NORMAL')
+            # REPLACE only fires the delete trigger with this switched on.
+            local.db.execute('PRAGMA recursive_triggers=ON')
+            local.db.executescript(SCHEMA)
+            local.pid = os.getpid()
+        return local.db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _load(self, rows):
+        """Unpickle live rows, dropping expired ones and refreshing LRU."""
+        now = time.time()
+        values, expired, touched = {}, [], []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                expired.append((key,))
+                continue
+            values[key] = pickle.loads(value)
+            if accessed < now - TOUCH_INTERVAL:
+                touched.append((now, key))
+        if expired:
+            self._db.executemany('DELETE FROM cache WHERE key = ?', expired)
+        if touched:
+            self._db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched
+            )
+        return values
+
+    def _select(self, keys):
+        marks = ','.join('?' * len(keys))
+        return self._db.execute(
+            'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({marks})', keys
+        ).fetchall()
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._load(self._select([key])).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        # Stay below SQLite's limit on bound parameters.
+        for start in range(0, len(names), 500):
+            found.update(self._load(self._select(names[start:start + 500])))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _write(self, rows, replace=True):
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        db = self._db
+        now = time.time()
+        with _transaction(db):
+            if not replace:
+                db.executemany(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    [(key, now) for key, *_ in rows]
+                )
+            changed = db.executemany(
+                f'{verb} INTO cache (key, value, expires, accessed, size) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(key, blob, expires, now, len(blob))
+                 for key, blob, expires in rows]
+            ).rowcount
+            self._cull(db, now)
+        return changed
+
+    def _cull(self, db, now):
+        entries, size = db.execute(
+            'SELECT entries, size FROM cache_totals'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        entries, size = db.execute(
+            'SELECT entries, size FROM cache_totals'
+        ).fetchone()
+        # Evict a slice at a time like the other backends, so that a full
+        # cache does not have to cull on every write.
+        batch = max(1, self._max_entries // max(self._cull_frequency, 1))
+        while entries > self._max_entries or size > self._max_size:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)', (batch,)
+            )
+            entries, size = db.execute(
+                'SELECT entries, size FROM cache_totals'
+            ).fetchone()
+
+    def _pack(self, key, value, timeout, version):
+        return (
+            self._key(key, version),
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self._expires(timeout),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([self._pack(key, value, timeout, version)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([
+            self._pack(key, value, timeout, version)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = self._pack(key, value, timeout, version)
+        return self._write([row], replace=False) == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), self._key(key, version), time.time())
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        with _transaction(db):
+            values = self._load(self._select([key]))
+            if key not in values:
+                raise ValueError("Key '%s' not found" % key)
+            value = values[key] + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (blob, len(blob), key)
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        return self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        ).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        with _transaction(self._db):
+            self._db.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                [(self._key(key, version),) for key in keys]
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+
+class _transaction:
+    """``BEGIN IMMEDIATE`` block: take the write lock before reading."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
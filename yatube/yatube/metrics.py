@@ -0,0 +1,333 @@
+"""Per-view request metrics.
+
+``MetricsMiddleware`` counts, for every request, the SQL queries and
+their time (through an execute wrapper on every connection, so that
+queries an async view runs in worker threads count too), the time
+spent rendering templates (``TimedTemplates`` backend), cache hits and
+misses (``MeasuredCache`` wrapped around the real cache) and the size
+of the response, and adds them up per view name.
+
+A statement that runs several times in one request with different
+parameters is usually a loop issuing one query per object (N + 1);
+such statements are counted as duplicates and logged once they reach
+``METRICS_DUPLICATE_QUERIES``. A view given a ``query_budget`` is also
+logged when it runs more queries than that; the test suite holds every
+route of ``posts`` to its budget.
+
+The totals are kept in the memory of each worker process and served in
+the Prometheus text format at ``/metrics/``. Requests from
+``INTERNAL_IPS`` also get a ``Server-Timing`` header, which the browser
+shows in the network panel.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_recorder = contextvars.ContextVar('metrics_recorder', default=None)
+
+# (metric name, type, help, field of the per-view totals)
+METRICS = (
+    ('yatube_requests_total', 'counter', 'Requests served.', 'requests'),
+    ('yatube_request_seconds_total', 'counter',
+     'Time spent serving requests.', 'seconds'),
+    ('yatube_db_queries_total', 'counter', 'SQL queries run.', 'queries'),
+    ('yatube_db_duplicate_queries_total', 'counter',
+     'Repeats of a statement already run in the same request.',
+     'duplicates'),
+    ('yatube_db_seconds_total', 'counter', 'Time spent in SQL.', 'sql'),
+    ('yatube_template_seconds_total', 'counter',
+     'Time spent rendering templates.', 'templates'),
+    ('yatube_cache_hits_total', 'counter', 'Cache reads that hit.', 'hits'),
+    ('yatube_cache_misses_total', 'counter',
+     'Cache reads that missed.', 'misses'),
+    ('yatube_response_bytes_total', 'counter',
+     'Size of the response bodies, streamed ones excluded.', 'bytes'),
+)
+
+
+class Recorder:
+    """What one request did; also the ``execute_wrapper`` hook."""
+
+    def __init__(self):
+        self.sql = 0.0
+        self.templates = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.statements = Counter()
+        self._depth = 0
+        # Concurrent reads of an async view record from several threads.
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self._lock:
+                self.sql += time.perf_counter() - started
+                self.statements[sql] += 1
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    @contextlib.contextmanager
+    def rendering(self):
+        # Templates rendered from inside another one are already timed.
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self.templates += time.perf_counter() - started
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.1f}',
+            f'cache;desc="{self.hits} hits, {self.misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+class Registry:
+    """Totals per view name since the process started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.views = defaultdict(Counter)
+
+    def record(self, view, seconds, recorder, size):
+        with self._lock:
+            totals = self.views[view]
+            totals.update({
+                'requests': 1,
+                'seconds': seconds,
+                'queries': recorder.queries,
+                'duplicates': recorder.duplicates,
+                'sql': recorder.sql,
+                'templates': recorder.templates,
+                'hits': recorder.hits,
+                'misses': recorder.misses,
+                'bytes': size or 0,
+            })
+
+    def render(self):
+        with self._lock:
+            views = {view: dict(totals) for view, totals in self.views.items()}
+        lines = []
+        for name, kind, description, field in METRICS:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for view, totals in sorted(views.items()):
+                label = (view.replace('\\', '\\\\').replace('"', '\\"')
+                         .replace('\n', '\\n'))
+                lines.append(
+                    f'{name}{{view="{label}"}} {totals.get(field, 0):g}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def is_internal(request):
+    return request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+def query_budget(queries):
+    """Declare the most queries one request to the view may run."""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _watch(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@receiver(connection_created)
+def watch_connection(sender, connection, **kwargs):
+    _watch(connection)
+
+
+class MetricsMiddleware:
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.async_call(request)
+        recorder, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def async_call(self, request):
+        recorder, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    def start(self):
+        # Connections opened before this module was loaded.
+        for connection in connections.all():
+            _watch(connection)
+        recorder = Recorder()
+        return recorder, _recorder.set(recorder), time.perf_counter()
+
+    def finish(self, request, response, recorder, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        registry.record(
+            view, elapsed, recorder,
+            None if response.streaming else len(response.content)
+        )
+        self.flag(view, match and match.func, recorder)
+        if is_internal(request):
+            response['Server-Timing'] = recorder.server_timing(elapsed)
+        return response
+
+    def flag(self, view, func, recorder):
+        budget = getattr(func, 'query_budget', None)
+        if budget is not None and recorder.queries > budget:
+            logger.warning('%s ran %d queries, over its budget of %d',
+                           view, recorder.queries, budget)
+        for sql, count in recorder.statements.items():
+            if count >= settings.METRICS_DUPLICATE_QUERIES:
+                logger.warning('%s ran %d times in one request: %s',
+                               view, count, sql)
+
+
+def export(request):
+    """Metrics in the Prometheus text format, for internal addresses."""
+    if not is_internal(request):
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        recorder = _recorder.get()
+        if recorder is None:
+            return super().render(context, request)
+        with recorder.rendering():
+            return super().render(context, request)
+
+
+class TimedTemplates(DjangoTemplates):
+    """``DjangoTemplates`` whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+_MISSING = object()
+
+
+def _delegate(name):
+    def method(self, *args, **kwargs):
+        return getattr(self.cache, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class MeasuredCache(BaseCache):
+    """Counts hits and misses of the cache given in ``OPTIONS['CACHE']``.
+
+    Every call goes to that cache unchanged, keys included.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        conf = dict(params['OPTIONS']['CACHE'])
+        backend = import_string(conf.pop('BACKEND'))
+        self.cache = backend(conf.pop('LOCATION', ''), conf)
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, _MISSING, version=version)
+        self._count(hits=value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self.cache.get_many(keys, version=version)
+        self._count(hits=len(values), misses=len(keys) - len(values))
+        return values
+
+    def _count(self, hits, misses=None):
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.hits += int(hits)
+            recorder.misses += int(not hits) if misses is None else misses
+
+    add = _delegate('add')
+    set = _delegate('set')
+    touch = _delegate('touch')
+    delete = _delegate('delete')
+    has_key = _delegate('has_key')
+    incr = _delegate('incr')
+    decr = _delegate('decr')
+    set_many = _delegate('set_many')
+    delete_many = _delegate('delete_many')
+    clear = _delegate('clear')
+    close = _delegate('close')
+    incr_version = _delegate('incr_version')
+    decr_version = _delegate('decr_version')
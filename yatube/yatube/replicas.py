@@ -0,0 +1,138 @@
+"""Send the reads of read-only views to replica databases.
+
+Views wrapped in ``replica_reads`` read the models of ``posts`` from
+one of ``DATABASE_REPLICAS``; everything else, and every write, goes to
+``default``. Sessions and users stay on the primary: a replica is only
+as fresh as its last sync, and a user who logged in since then would
+look logged out. Once a request writes, the rest of it reads from the
+primary too, and ``ReplicaMiddleware`` sets a cookie that keeps the
+user's reads on the primary for ``REPLICA_STICKY_SECONDS`` so that they
+see their own post or comment before the replicas catch up. Reads that
+fill a shared cache go to the primary within ``primary_reads``: a
+replica that has not caught up would keep stale rows cached long after
+it has.
+
+Locally the replicas are plain SQLite files refreshed from the primary
+with ``manage.py sync_replica``.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import random
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+
+STICKY_COOKIE = 'db_primary'
+
+_state = contextvars.ContextVar('replica_state', default=None)
+
+
+class _State:
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.replica = False
+        self.wrote = False
+
+
+def replica_reads(view):
+    """Let ``view`` read from a replica unless the user just wrote."""
+    def use_replica():
+        state = _state.get()
+        if state is not None:
+            state.replica = True
+
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            use_replica()
+            return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            use_replica()
+            return view(request, *args, **kwargs)
+    wrapper.replica_reads = True
+    return wrapper
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Read from the primary within the block."""
+    state = _state.get()
+    if state is None or not state.replica:
+        yield
+        return
+    state.replica = False
+    try:
+        yield
+    finally:
+        state.replica = True
+
+
+class ReplicaRouter:
+    replicated_apps = {'posts'}
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (model._meta.app_label not in self.replicated_apps
+                or state is None or not state.replica or state.sticky
+                or state.wrote or not settings.DATABASE_REPLICAS):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.async_call(request)
+        state = _State(sticky=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(response, state)
+
+    async def async_call(self, request):
+        # The state is shared with the threads the view reads in.
+        state = _State(sticky=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +44,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.TimedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -57,6 +59,13 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+# yatube/asgi.py turns this on: the feed, profile and post pages are
+# then served by posts.async_views.
+ASYNC_VIEWS = os.environ.get('YATUBE_ASYNC_VIEWS') == '1'
+# Threads the async views run their concurrent reads in; each keeps a
+# database connection of its own.
+ASYNC_READ_THREADS = 32
 
 DATABASES = {
     'default': {
@@ -64,6 +73,42 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
+# YATUBE_DB_PROFILE=production: WAL so that readers do not block the
+# writer, writes that wait for the lock instead of failing, and
+# connections kept open between requests.
+if os.environ.get('YATUBE_DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'yatube.sqlite',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 20000,
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+    })
+
+# Read-only views read from these copies of the primary, if any. Set
+# YATUBE_REPLICA_PATHS to comma-separated SQLite files and refresh them
+# with manage.py sync_replica; tests read them from the primary.
+DATABASE_REPLICAS = []
+for index, path in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICA_PATHS', '').split(','))):
+    DATABASE_REPLICAS.append(f'replica{index}')
+    DATABASES[f'replica{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+# How long a user who wrote something keeps reading from the primary.
+REPLICA_STICKY_SECONDS = 15
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -90,12 +135,82 @@ USE_L10N = True
 
 USE_TZ = True
 
+# The tables were made with 32-bit ids; keep them.
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# With several worker processes set YATUBE_CACHE_PATH to share one cache
+# file between them instead of keeping a LocMemCache in every worker.
+if os.environ.get('YATUBE_CACHE_PATH'):
+    CACHES['default'] = {
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.environ['YATUBE_CACHE_PATH'],
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
+    }
+# Wrapped so that the metrics middleware can count hits and misses.
+CACHES['default'] = {
+    'BACKEND': 'yatube.metrics.MeasuredCache',
+    'OPTIONS': {'CACHE': CACHES['default']},
+}
+
+# /metrics/ and the Server-Timing header are only served to these
+# addresses. A statement run this many times in one request is logged
+# as a likely N + 1 query.
+INTERNAL_IPS = ['127.0.0.1']
+METRICS_DUPLICATE_QUERIES = 5
+
+# The rows of the index pages are dropped from the cache as soon as a
+# post, comment or group changes, so they can be kept for a long time,
+# but only in a cache all workers share: a LocMemCache is only told
+# about the changes made by its own process.
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6 if os.environ.get('YATUBE_CACHE_PATH') else 15
+
+# Rendered post cards are keyed by Post.version, so stale ones are never
+# read and only need to fall out of the cache eventually.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Follow and unfollow drop a user's cached set of followed authors, so
+# this only bounds how long a missed invalidation can last.
+FOLLOWING_CACHE_TIMEOUT = 60
+
+# Each process keeps the groups it loaded until a group changes (see
+# posts.groups); without a shared cache it cannot hear of changes made
+# by other workers, so it also reloads them this often.
+GROUPS_REGISTRY_TIMEOUT = 60
+
+# Feed and post pages send their head before rendering the post cards
+# and comments, which then follow one by one (see posts.streaming).
+STREAM_PAGES = os.environ.get('YATUBE_STREAM_PAGES') == '1'
+
+# Usernames resolved to user ids. Saving or deleting a user drops the
+# entry; an unknown name is remembered for less time, so that crawlers
+# asking for missing profiles do not reach the database on every hit.
+USERNAME_CACHE_TIMEOUT = 60 * 60 * 24
+USERNAME_MISSING_CACHE_TIMEOUT = 60 * 5
+
+# Thumbnails are made by a background thread pool after an upload;
+# post cards only show the ones that are ready.
+THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# The same worker stores the card crop at these widths in each of these
+# formats (best first, skipped if Pillow cannot write one) for srcset.
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')
+IMAGE_VARIANT_RATIO = (960, 339)
+IMAGE_VARIANT_QUALITY = 80
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
@@ -105,6 +220,13 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Authors with more followers than this are not fanned out into the
+# follow feed timelines; their posts are pulled at read time instead.
+TIMELINE_FANOUT_LIMIT = 1000
+# A new follow copies at most this many of the author's latest posts
+# into the follower's timeline.
+TIMELINE_BACKFILL_LIMIT = 200
+
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'index'
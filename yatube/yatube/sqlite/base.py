@@ -0,0 +1,40 @@
+"""SQLite backend tuned for several concurrent workers.
+
+``ENGINE = 'yatube.sqlite'`` is Django's sqlite3 backend plus two
+options:
+
+``pragmas``
+    Applied to every new connection, e.g. WAL mode so readers never
+    wait for the writer.
+``transaction_mode``
+    ``'IMMEDIATE'`` makes ``atomic()`` take the write lock when it
+    starts. A deferred transaction that reads and then writes cannot
+    wait for another writer: SQLite fails it with "database is locked"
+    at once, whatever the busy timeout.
+
+The stock ``timeout`` option is how long to wait for the write lock.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('pragmas', {}))
+        self.transaction_mode = options.get('transaction_mode')
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,284 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import ResolverMatch, resolve, reverse
+from posts import groups
+from posts.models import Group, Post, User
+
+from .cache import SQLiteCache
+from .metrics import MetricsMiddleware, query_budget, registry
+from .replicas import (STICKY_COOKIE, ReplicaMiddleware, primary_reads,
+                       replica_reads)
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def make_cache(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return SQLiteCache(
+            os.path.join(directory.name, 'cache.sqlite3'),
+            {'OPTIONS': options}
+        )
+
+    def test_basic_operations(self):
+        """Тест записи, чтения, add, incr и удаления........................"""
+        cache = self.make_cache()
+        cache.set('a', {'x': 1})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 2))
+        self.assertEqual(cache.incr('b', 3), 5)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']),
+                         {'a': {'x': 1}, 'b': 5})
+        self.assertTrue(cache.delete('a'))
+        self.assertFalse(cache.delete('a'))
+        self.assertIsNone(cache.get('a'))
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_expired_entries_are_missing(self):
+        """Тест истечения срока жизни записи................................"""
+        cache = self.make_cache()
+        cache.set('a', 1, timeout=0)
+        self.assertFalse(cache.has_key('a'))
+        self.assertTrue(cache.add('a', 2))
+        self.assertEqual(cache.get('a'), 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Тест вытеснения давно не читавшихся записей......................"""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for key in 'abc':
+            cache.set(key, key)
+        cache._db.execute('UPDATE cache SET accessed = ?', (time.time(),))
+        cache._db.execute(
+            "UPDATE cache SET accessed = 0 WHERE key LIKE '%a'"
+        )
+        cache.set('d', 'd')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get_many('bcd'), {'b': 'b', 'c': 'c', 'd': 'd'})
+
+    def test_size_cap(self):
+        """Тест ограничения суммарного размера значений....................."""
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(10):
+            cache.set(number, 'x' * 3000)
+        entries, size = cache._db.execute(
+            'SELECT entries, size FROM cache_totals'
+        ).fetchone()
+        self.assertLessEqual(size, 10000)
+        count = cache._db.execute('SELECT count(*) FROM cache').fetchone()
+        self.assertEqual(entries, count[0])
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaRouterTest(SimpleTestCase):
+    def serve(self, request, view):
+        reads = []
+
+        def record(request):
+            reads.append(router.db_for_read(Post))
+            if request.method == 'POST':
+                router.db_for_write(Post)
+                reads.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view(record))(request)
+        return reads, response
+
+    def test_read_views_use_replica_until_write(self):
+        """Тест чтения с реплики до первой записи в запросе................."""
+        factory = RequestFactory()
+        reads, response = self.serve(factory.get('/'), replica_reads)
+        self.assertEqual(reads, ['replica0'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        reads, _ = self.serve(factory.get('/'), lambda view: view)
+        self.assertEqual(reads, ['default'])
+
+        reads, response = self.serve(factory.post('/'), replica_reads)
+        self.assertEqual(reads, ['replica0', 'default'])
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_sessions_and_users_read_primary(self):
+        """Тест что сессии и пользователи читаются с основной базы.........."""
+        reads = []
+
+        def record(request):
+            reads.extend(
+                router.db_for_read(model) for model in (Session, User, Post)
+            )
+            return HttpResponse()
+
+        ReplicaMiddleware(replica_reads(record))(RequestFactory().get('/'))
+        self.assertEqual(reads, ['default', 'default', 'replica0'])
+
+    def test_sticky_cookie_reads_primary(self):
+        """Тест чтения с основной базы сразу после записи..................."""
+        request = RequestFactory().get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        reads, _ = self.serve(request, replica_reads)
+        self.assertEqual(reads, ['default'])
+
+    def test_primary_reads_block(self):
+        """Тест чтения с основной базы внутри primary_reads................."""
+        reads = []
+
+        def record(request):
+            with primary_reads():
+                reads.append(router.db_for_read(Post))
+            reads.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        ReplicaMiddleware(replica_reads(record))(RequestFactory().get('/'))
+        self.assertEqual(reads, ['default', 'replica0'])
+
+    def test_migrations_skip_replicas(self):
+        """Тест что миграции не применяются к репликам......................"""
+        self.assertFalse(router.allow_migrate('replica0', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+    def test_feed_views_marked(self):
+        """Тест что только ленты читают с реплик............................"""
+        marked = {
+            name: getattr(resolve(reverse(name, kwargs=kwargs)).func,
+                          'replica_reads', False)
+            for name, kwargs in (
+                ('index', {}),
+                ('group_posts', {'slug': 'slug'}),
+                ('profile', {'username': 'user'}),
+                ('post', {'username': 'user', 'post_id': 1}),
+                ('follow_index', {}),
+                ('new_post', {}),
+                ('edit', {'username': 'user', 'post_id': 1}),
+                ('add_comment', {'username': 'user', 'post_id': 1}),
+                ('profile_follow', {'username': 'user'}),
+            )
+        }
+        self.assertEqual(marked, {
+            'index': True, 'group_posts': True, 'profile': True,
+            'post': True, 'follow_index': True, 'new_post': False,
+            'edit': False, 'add_comment': False, 'profile_follow': False,
+        })
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaCacheFillTest(TestCase):
+    """Базы ``replica0`` нет: чтение с неё сломало бы запрос."""
+
+    def test_index_cache_filled_from_primary(self):
+        """Тест что главная и группы кэшируются с основной базы............."""
+        group = Group.objects.create(title='Group', slug='group')
+        Post.objects.create(
+            text='Primary', group=group,
+            author=User.objects.create(username='author')
+        )
+        cache.clear()
+        groups.forget()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Primary')
+        self.assertEqual(groups.by_id(group.pk), group)
+
+
+class TunedSQLiteTest(SimpleTestCase):
+    def test_pragmas_and_immediate_transactions(self):
+        """Тест настроек соединения и захвата записи в начале транзакции...."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'db.sqlite3')
+        connections.databases['tuned'] = {
+            'ENGINE': 'yatube.sqlite',
+            'NAME': path,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL',
+                            'mmap_size': 1 << 20},
+            },
+        }
+        self.addCleanup(connections.databases.pop, 'tuned')
+        connection = connections['tuned']
+        self.addCleanup(delattr, connections._connections, 'tuned')
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            pragmas = [
+                cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'mmap_size')
+            ]
+        self.assertEqual(pragmas, ['wal', 1, 1 << 20])
+
+        other = sqlite3.connect(path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='tuned'):
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username='author')
+        Post.objects.create(author=author, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_metrics_recorded_per_view(self):
+        """Тест счётчиков запросов к базе, кэша и заголовка Server-Timing..."""
+        response = self.client.get(reverse('index'))
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+        self.client.get(reverse('index'))
+        totals = registry.views['index']
+        self.assertEqual(totals['requests'], 2)
+        self.assertGreater(totals['queries'], 0)
+        self.assertGreater(totals['templates'], 0)
+        self.assertGreater(totals['hits'], 0)
+        self.assertGreater(totals['bytes'], 0)
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_requests_total{view="index"} 2', metrics)
+        self.assertIn('# TYPE yatube_db_queries_total counter', metrics)
+
+    def test_internal_addresses_only(self):
+        """Тест что метрики видны только с внутренних адресов..............."""
+        outside = {'REMOTE_ADDR': '10.0.0.1'}
+        response = self.client.get(reverse('metrics'), **outside)
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('index'), **outside)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_duplicate_queries_flagged(self):
+        """Тест отметки одинаковых запросов в цикле........................."""
+        def view(request):
+            for pk in range(5):
+                list(Post.objects.filter(pk=pk))
+            return HttpResponse()
+
+        with self.assertLogs('yatube.metrics', 'WARNING') as logs:
+            MetricsMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('ran 5 times', logs.output[0])
+        self.assertEqual(registry.views['<unresolved>']['duplicates'], 4)
+
+    def test_query_budget_flagged(self):
+        """Тест отметки представления, превысившего бюджет запросов........."""
+        @query_budget(1)
+        def view(request):
+            list(User.objects.all())
+            list(Post.objects.all())
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = ResolverMatch(view, (), {})
+        with self.assertLogs('yatube.metrics', 'WARNING') as logs:
+            MetricsMiddleware(view)(request)
+        self.assertIn('ran 2 queries, over its budget of 1', logs.output[0])